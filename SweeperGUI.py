@@ -1,14 +1,24 @@
+import logging
 import pyqtgraph as pg
 import sys
-from datetime import datetime
-from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QPushButton, QHBoxLayout, QVBoxLayout, QWidget, QPlainTextEdit, QComboBox, QLineEdit, QSizePolicy, QFrame, QCheckBox, QAction, QMessageBox
-import numpy as np
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QPushButton, QHBoxLayout, QVBoxLayout, QWidget, QPlainTextEdit, QComboBox, QLineEdit, QSizePolicy, QFrame, QCheckBox, QAction, QMessageBox, QFileDialog
 
+import log_setup
+from compensation import CompensationTable
 from device_manager import DeviceManager
+from plot_updater import PlotUpdater
+from session_store import SESSIONS_DIR
+from devices.bus_monitor import BusMonitor
 from sweep_model import SweepModel
 from sweep_controller import SweepController
 
+logger = logging.getLogger(__name__)
+
 class MainWindow(QMainWindow):
+    # How often buffered log messages are written to the log box.
+    LOG_REFRESH_MS = 100
+
     def __init__(self):
         super().__init__()
 
@@ -16,11 +26,13 @@ class MainWindow(QMainWindow):
         self.setGeometry(100, 100, 800, 500)
 
         self.init_ui()
+        self.init_logging()
         self.init_models_and_controllers()
         self.connect_signals()
 
         self.load_config()
-        self.device_manager.discover_devices()
+        # Discovery runs on a worker thread, so the window shows without waiting for the bus.
+        self.device_manager.start_discovery(use_cache=True)
 
     def init_ui(self):
         self.init_menu()
@@ -147,6 +159,24 @@ class MainWindow(QMainWindow):
         self.tbPower = QLineEdit("-40")
         hlayout.addWidget(self.tbPower)
 
+        self.lblPowerMode = QLabel("Power Reading: ", self)
+        hlayout.addWidget(self.lblPowerMode)
+        self.cbPowerMode = QComboBox()
+        self.cbPowerMode.addItem("Marker", "marker")
+        self.cbPowerMode.addItem("Trace Mean", "trace_mean")
+        hlayout.addWidget(self.cbPowerMode)
+
+        self.lblSettleTolerance = QLabel("Settle Tolerance (dB): ", self)
+        hlayout.addWidget(self.lblSettleTolerance)
+        self.tbSettleTolerance = QLineEdit("")
+        self.tbSettleTolerance.setPlaceholderText("off")
+        hlayout.addWidget(self.tbSettleTolerance)
+
+        self.lblAdaptiveTolerance = QLabel("Adaptive Tolerance (dB): ", self)
+        hlayout.addWidget(self.lblAdaptiveTolerance)
+        self.tbAdaptiveTolerance = QLineEdit("1")
+        hlayout.addWidget(self.tbAdaptiveTolerance)
+
         self.cbDisableTracking = QCheckBox("Disable signal generator tracking")
         self.cbDisableTracking.setChecked(False)
         hlayout.addWidget(self.cbDisableTracking)
@@ -166,6 +196,15 @@ class MainWindow(QMainWindow):
 
         self.btnContinuousInterpolation = QPushButton("Continuous Interpolation", self)
         sweep_button_layout.addWidget(self.btnContinuousInterpolation)
+
+        self.btnAdaptiveSweep = QPushButton("Adaptive Sweep", self)
+        sweep_button_layout.addWidget(self.btnAdaptiveSweep)
+
+        self.btnResumeSweep = QPushButton("Resume Sweep", self)
+        sweep_button_layout.addWidget(self.btnResumeSweep)
+
+        self.btnAutoAlign = QPushButton("Auto Align Offset", self)
+        sweep_button_layout.addWidget(self.btnAutoAlign)
         vlayout.addLayout(sweep_button_layout)
 
         self.tbLog = QPlainTextEdit()
@@ -177,13 +216,42 @@ class MainWindow(QMainWindow):
             self.cbSignalGenerator, self.cbSGAddr, self.cbSpectrumAnalyzer, self.cbSAAddr,
             self.btnDiscoverDevices, self.btnConnectDisconnect, self.tbStartFreq,
             self.tbStopFreq, self.cbRBW, self.tbPoints, self.tbSAFreqOffset,
-            self.tbPower, self.cbDisableTracking, self.tbSGFreq, self.btnSetSGFreq,
-            self.btnClearSweepData, self.btnRunSweep, self.btnContinuousInterpolation
+            self.tbPower, self.cbPowerMode, self.tbSettleTolerance, self.tbAdaptiveTolerance, self.cbDisableTracking,
+            self.tbSGFreq, self.btnSetSGFreq, self.btnClearSweepData, self.btnRunSweep, self.btnContinuousInterpolation,
+            self.btnAdaptiveSweep, self.btnResumeSweep, self.btnAutoAlign
         ]
 
     def init_menu(self):
         menu_bar = self.menuBar()
         file_menu = menu_bar.addMenu("File")
+        self.open_session_action = QAction("Open Session...", self)
+        self.open_session_action.triggered.connect(self.handle_open_session)
+        file_menu.addAction(self.open_session_action)
+        file_menu.addSeparator()
+        apply_compensation_action = QAction("Apply Compensation...", self)
+        apply_compensation_action.triggered.connect(self.handle_apply_compensation)
+        file_menu.addAction(apply_compensation_action)
+        clear_compensation_action = QAction("Clear Compensation", self)
+        clear_compensation_action.triggered.connect(lambda: self.set_compensation_files([]))
+        file_menu.addAction(clear_compensation_action)
+        file_menu.addSeparator()
+        self.record_bus_action = QAction("Record Bus Traffic", self)
+        self.record_bus_action.setCheckable(True)
+        self.record_bus_action.toggled.connect(self.handle_record_bus_traffic)
+        file_menu.addAction(self.record_bus_action)
+        export_bus_action = QAction("Export Bus Log...", self)
+        export_bus_action.triggered.connect(self.handle_export_bus_log)
+        file_menu.addAction(export_bus_action)
+        file_menu.addSeparator()
+        self.debug_log_action = QAction("Show Debug Messages", self)
+        self.debug_log_action.setCheckable(True)
+        self.debug_log_action.toggled.connect(self.handle_debug_log)
+        file_menu.addAction(self.debug_log_action)
+        self.log_file_action = QAction("Log to File...", self)
+        self.log_file_action.setCheckable(True)
+        self.log_file_action.triggered.connect(self.handle_log_to_file)
+        file_menu.addAction(self.log_file_action)
+        file_menu.addSeparator()
         exit_action = QAction("Exit", self)
         exit_action.triggered.connect(self.close)
         file_menu.addAction(exit_action)
@@ -196,24 +264,37 @@ class MainWindow(QMainWindow):
         about_action.triggered.connect(self.show_about)
         help_menu.addAction(about_action)
 
+    def init_logging(self):
+        # Messages from any thread are buffered and written to the log box in
+        # batches, so logging never waits on the GUI.
+        self.log_handler = log_setup.BufferedHandler(logging.INFO)
+        log_setup.add_handler(self.log_handler)
+        self.file_log_handler = None
+        self.log_file = ""
+        self.log_timer = QTimer(self)
+        self.log_timer.timeout.connect(self.drain_log)
+        self.log_timer.start(self.LOG_REFRESH_MS)
+
     def init_models_and_controllers(self):
         self.device_manager = DeviceManager()
         self.sweep_model = SweepModel()
         self.sweep_controller = SweepController(self.device_manager, self.sweep_model)
+        self.plot_updater = PlotUpdater(self.sweep_model, self.scatter, self.curve, self)
         self.last_sa_addr = ""
         self.last_sg_addr = ""
+        self.bus_monitor = None
+        self.compensation_files = []
 
     def connect_signals(self):
         # Device Manager Signals
         self.device_manager.log.connect(self.log)
         self.device_manager.devices_discovered.connect(self.update_device_lists)
         self.device_manager.connection_status_changed.connect(self.on_connection_status_changed)
-        self.btnDiscoverDevices.clicked.connect(self.device_manager.discover_devices)
+        self.btnDiscoverDevices.clicked.connect(lambda: self.device_manager.start_discovery())
         self.btnConnectDisconnect.clicked.connect(self.handle_connect_disconnect)
 
         # Sweep Model Signals
         self.sweep_model.log.connect(self.log)
-        self.sweep_model.data_changed.connect(self.update_plot)
         self.btnClearSweepData.clicked.connect(self.handle_clear_data)
 
         # Sweep Controller Signals
@@ -221,25 +302,75 @@ class MainWindow(QMainWindow):
         self.sweep_controller.sweep_status_changed.connect(self.set_ui_for_sweep)
         self.btnRunSweep.clicked.connect(lambda: self.handle_sweep_start('run_sweep'))
         self.btnContinuousInterpolation.clicked.connect(lambda: self.handle_sweep_start('continuous_interpolation'))
+        self.btnAdaptiveSweep.clicked.connect(lambda: self.handle_sweep_start('adaptive_sweep'))
+        self.btnResumeSweep.clicked.connect(lambda: self.sweep_controller.resume_sweep())
         self.btnSetSGFreq.clicked.connect(lambda: self.sweep_controller.update_sg_freq(self.tbSGFreq.text()))
+        self.btnAutoAlign.clicked.connect(self.handle_auto_align)
+        self.sweep_controller.offset_calibrated.connect(self.on_offset_calibrated)
 
     def log(self, message):
-        self.tbLog.appendPlainText(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}\t{message}")
-        self.tbLog.verticalScrollBar().setValue(self.tbLog.verticalScrollBar().maximum())
+        logger.info("%s", message)
+
+    def drain_log(self):
+        messages = self.log_handler.drain()
+        if messages:
+            self.tbLog.appendPlainText("\n".join(messages))
+            self.tbLog.verticalScrollBar().setValue(self.tbLog.verticalScrollBar().maximum())
+
+    def handle_debug_log(self, enabled):
+        log_setup.set_handler_level(self.log_handler, logging.DEBUG if enabled else logging.INFO)
+
+    def handle_log_to_file(self, enabled):
+        if enabled:
+            filepath, _ = QFileDialog.getSaveFileName(self, "Log to File", self.log_file or "sweeper.log",
+                                                      "Log files (*.log);;All files (*)")
+            if not filepath:
+                self.log_file_action.setChecked(False)
+                return
+            self.enable_file_logging(filepath)
+        else:
+            self.disable_file_logging()
+
+    def enable_file_logging(self, filepath):
+        self.disable_file_logging()
+        try:
+            self.file_log_handler = log_setup.enable_file_logging(filepath)
+        except OSError as e:
+            self.log(f"Error opening log file: {e}")
+            self.log_file_action.setChecked(False)
+            return
+        self.log_file = filepath
+        self.log_file_action.setChecked(True)
+        self.log(f"Logging debug detail to {filepath}")
+
+    def disable_file_logging(self):
+        if self.file_log_handler:
+            log_setup.remove_handler(self.file_log_handler)
+            self.file_log_handler = None
+            self.log_file = ""
     
     def update_device_lists(self, devices):
-        self.cbSAAddr.clear()
-        self.cbSGAddr.clear()
-        self.cbSAAddr.addItems(devices)
-        self.cbSGAddr.addItems(devices)
-
-        if self.last_sa_addr in devices:
-            self.cbSAAddr.setCurrentText(self.last_sa_addr)
-        if self.last_sg_addr in devices:
-            self.cbSGAddr.setCurrentText(self.last_sg_addr)
+        """
+        Lists every GPIB address, labelled with the model found there. Prefers
+        the last used addresses, then the first instrument of each kind.
+        """
+        for address_box in (self.cbSAAddr, self.cbSGAddr):
+            address_box.clear()
+            for address, model in devices.items():
+                address_box.addItem(f"{address} ({model})" if model else address, address)
+
+        for address_box, model_box, last_addr in ((self.cbSAAddr, self.cbSpectrumAnalyzer, self.last_sa_addr),
+                                                  (self.cbSGAddr, self.cbSignalGenerator, self.last_sg_addr)):
+            models = [model_box.itemText(i) for i in range(model_box.count())]
+            if last_addr not in devices:
+                last_addr = next((address for address, model in devices.items() if model in models), "")
+            if last_addr:
+                address_box.setCurrentIndex(address_box.findData(last_addr))
+                if devices[last_addr] in models:
+                    model_box.setCurrentText(devices[last_addr])
 
         if self.last_sa_addr and self.last_sg_addr and not self.device_manager.connected:
-            if self.last_sa_addr in devices and self.last_sg_addr in devices:
+            if devices.get(self.last_sa_addr) and devices.get(self.last_sg_addr):
                 self.handle_connect_disconnect()
 
     def on_connection_status_changed(self, connected, sa_id, sg_id):
@@ -253,8 +384,8 @@ class MainWindow(QMainWindow):
         if self.device_manager.connected:
             self.device_manager.disconnect_devices()
         else:
-            sa_addr = self.cbSAAddr.currentText()
-            sg_addr = self.cbSGAddr.currentText()
+            sa_addr = self.cbSAAddr.currentData()
+            sg_addr = self.cbSGAddr.currentData()
             sa_model = self.cbSpectrumAnalyzer.currentText()
             sg_model = self.cbSignalGenerator.currentText()
             if not sa_addr or not sg_addr:
@@ -268,28 +399,91 @@ class MainWindow(QMainWindow):
         if reply == QMessageBox.Yes:
             self.sweep_model.clear_data()
 
+    def handle_record_bus_traffic(self, enabled):
+        if enabled:
+            self.bus_monitor = BusMonitor()
+            self.device_manager.set_bus_monitor(self.bus_monitor)
+            self.log("Recording bus traffic.")
+        else:
+            # Keep the recorded traffic around for export.
+            self.device_manager.set_bus_monitor(None)
+            self.log("Stopped recording bus traffic.")
+
+    def handle_export_bus_log(self):
+        if self.bus_monitor is None:
+            self.log("No bus traffic recorded. Enable File > Record Bus Traffic first.")
+            return
+        filepath, _ = QFileDialog.getSaveFileName(self, "Export Bus Log", "bus_log.json", "JSON (*.json);;CSV (*.csv)")
+        if not filepath:
+            return
+        self.bus_monitor.export(filepath)
+        self.log(f"Exported bus log to {filepath}\n{self.bus_monitor.summary()}")
+
+    def handle_open_session(self):
+        directory = QFileDialog.getExistingDirectory(self, "Open Session", SESSIONS_DIR)
+        if directory:
+            self.sweep_model.load_session(directory)
+
+    def handle_apply_compensation(self):
+        filepaths, _ = QFileDialog.getOpenFileNames(self, "Apply Compensation", "",
+                                                    "CSV files (*.csv);;All files (*)")
+        if filepaths:
+            self.set_compensation_files(filepaths)
+
+    def set_compensation_files(self, filepaths):
+        """Plots power corrected by the sum of the given compensation files, or as measured if there are none."""
+        tables = []
+        for filepath in filepaths:
+            try:
+                tables.append(CompensationTable.load(filepath))
+            except (OSError, ValueError) as e:
+                self.log(f"Error loading compensation file '{filepath}': {e}")
+        self.compensation_files = [table.name for table in tables]
+        self.plot_updater.set_compensation(CompensationTable.chain(tables) if tables else None)
+        if tables:
+            self.plot_widget.setLabel('left', 'Corrected Amplitude (dBm)')
+            self.log(f"Applying compensation: {', '.join(self.compensation_files)}")
+        else:
+            self.plot_widget.setLabel('left', 'Amplitude (dBm)')
+
     def handle_sweep_start(self, sweep_type):
-        config = {
+        self.sweep_controller.start_sweep(sweep_type, self.get_sweep_config(sweep_type))
+
+    def handle_auto_align(self):
+        self.sweep_controller.calibrate_offset(self.get_sweep_config('calibrate_offset'))
+
+    def on_offset_calibrated(self, offset):
+        self.tbSAFreqOffset.setText(str(offset))
+        self.log(f"Analyzer frequency offset set to {offset} Hz")
+
+    def get_sweep_config(self, sweep_type):
+        return {
             "start_freq": self.tbStartFreq.text(),
             "stop_freq": self.tbStopFreq.text(),
             "rbw": self.cbRBW.currentText(),
             "points": self.tbPoints.text(),
             "sa_freq_offset": self.tbSAFreqOffset.text(),
             "power": self.tbPower.text(),
+            "power_mode": self.cbPowerMode.currentData(),
+            "settle_tolerance_db": self.tbSettleTolerance.text(),
+            "adaptive_tolerance_db": self.tbAdaptiveTolerance.text(),
             "sg_tracking_disabled": self.cbDisableTracking.isChecked(),
             "sg_manual_freq": self.tbSGFreq.text(),
             "active_button": sweep_type
         }
-        self.sweep_controller.start_sweep(sweep_type, config)
     
     def set_ui_for_sweep(self, is_running, active_button_type):
+        self.open_session_action.setEnabled(not is_running)
         for element in self.ui_elements_to_disable:
-            if element not in [self.btnRunSweep, self.btnContinuousInterpolation]:
+            if element not in [self.btnRunSweep, self.btnContinuousInterpolation, self.btnAdaptiveSweep,
+                               self.btnResumeSweep]:
                 element.setEnabled(not is_running)
 
         button_map = {
             'run_sweep': self.btnRunSweep,
-            'continuous_interpolation': self.btnContinuousInterpolation
+            'continuous_interpolation': self.btnContinuousInterpolation,
+            'adaptive_sweep': self.btnAdaptiveSweep,
+            'resume_sweep': self.btnResumeSweep
         }
 
         if is_running:
@@ -303,35 +497,12 @@ class MainWindow(QMainWindow):
         else:
             self.btnRunSweep.setText("Run Sweep")
             self.btnContinuousInterpolation.setText("Continuous Interpolation")
+            self.btnAdaptiveSweep.setText("Adaptive Sweep")
+            self.btnResumeSweep.setText("Resume Sweep")
             for btn_widget in button_map.values():
                 btn_widget.setStyleSheet("")
                 btn_widget.setEnabled(True)
 
-    def update_plot(self):
-        sweep_data = self.sweep_model.get_sweep_data()
-        if sweep_data.empty:
-            self.scatter.setData([], [])
-            self.curve.setData([], [])
-            return
-
-        raw_freqs = sweep_data['frequency'].values
-        raw_powers = sweep_data['power'].values
-        
-        plot_df = sweep_data.copy()
-        plot_df['freq_group'] = (plot_df['frequency'] / 10).round() * 10
-        averaged_data = plot_df.groupby('freq_group')['power'].mean().reset_index()
-        
-        line_freqs = averaged_data['freq_group'].values
-        line_powers = averaged_data['power'].values
-
-        sort_indices = np.argsort(line_freqs)
-        line_freqs = line_freqs[sort_indices]
-        line_powers = line_powers[sort_indices]
-
-        self.log("Updating plot...")
-        self.scatter.setData(raw_freqs, raw_powers)
-        self.curve.setData(line_freqs, line_powers, pen=pg.mkPen(color='b', width=2), symbol=None)
-
     def save_config(self):
         config = {
             "start_freq": self.tbStartFreq.text(),
@@ -340,10 +511,16 @@ class MainWindow(QMainWindow):
             "points": self.tbPoints.text(),
             "sa_freq_offset": self.tbSAFreqOffset.text(),
             "power": self.tbPower.text(),
+            "power_mode": self.cbPowerMode.currentData(),
+            "settle_tolerance_db": self.tbSettleTolerance.text(),
+            "adaptive_tolerance_db": self.tbAdaptiveTolerance.text(),
             "sg_tracking_disabled": self.cbDisableTracking.isChecked(),
             "sg_manual_freq": self.tbSGFreq.text(),
-            "sa_address": self.cbSAAddr.currentText(),
-            "sg_address": self.cbSGAddr.currentText()
+            "show_debug_log": self.debug_log_action.isChecked(),
+            "log_file": self.log_file,
+            "compensation_files": self.compensation_files,
+            "sa_address": self.cbSAAddr.currentData() or "",
+            "sg_address": self.cbSGAddr.currentData() or ""
         }
         # Save window geometry
         geometry = self.geometry()
@@ -363,8 +540,21 @@ class MainWindow(QMainWindow):
         self.tbPoints.setText(config.get("points", "41"))
         self.tbSAFreqOffset.setText(config.get("sa_freq_offset", "0"))
         self.tbPower.setText(config.get("power", "-40"))
+        # Older configs saved the label ("Marker") rather than the mode.
+        power_mode = config.get("power_mode", "marker")
+        power_mode_index = self.cbPowerMode.findData(power_mode)
+        if power_mode_index < 0:
+            power_mode_index = max(self.cbPowerMode.findText(power_mode), 0)
+        self.cbPowerMode.setCurrentIndex(power_mode_index)
+        self.tbSettleTolerance.setText(config.get("settle_tolerance_db", ""))
+        self.tbAdaptiveTolerance.setText(config.get("adaptive_tolerance_db", "1"))
         self.cbDisableTracking.setChecked(config.get("sg_tracking_disabled", False))
         self.tbSGFreq.setText(config.get("sg_manual_freq", ""))
+        self.debug_log_action.setChecked(config.get("show_debug_log", False))
+        if config.get("log_file"):
+            self.enable_file_logging(config["log_file"])
+        if config.get("compensation_files"):
+            self.set_compensation_files(config["compensation_files"])
         self.last_sa_addr = config.get("sa_address", "")
         self.last_sg_addr = config.get("sg_address", "")
         
@@ -379,14 +569,18 @@ class MainWindow(QMainWindow):
                 self.setGeometry(x, y, width, height)
     
     def show_alignment(self):
-        QMessageBox.about(self, "Alignment Procedure", "Unless SA and SG share a common oscillator, their frequencies will not match exactly and very likely will result in data that is garbage for sweeps with low RBW.\nWe can compensate for this mismatch in software by finding the difference between SA and SG frequencies and using this value to offset the SA frequency relative to the SG frequency.\n\nSteps:\n1) Connect devices.\n2) Disable SG tracking.\n3) Manually set SG to the center frequency of your desired sweep.\n\t*Note that the frequency must be set to something evenly divisible by your SG's smallest frequency step. (Ex. HP8673B has 4kHz steps so center freq should be divisible by 4kHz.\n4) Set start/stop frequencies to be just a bit wider than the anticipated frequency offset. +/-8kHz may be good to start with and adjust accordingly.\n5) Set number of sweep points. This will also vary case-by-base, but 40-60 points is usually good.\n6) Set RBW. Typically, #Points=(SweepRange/RBW)\n7) Perform sweep.\n8) Determine where the signal peak is and calculate the difference between the expected frequency and the measured frequency.\n9) Enter this value in the Analyzer Freq Offset box.")
+        QMessageBox.about(self, "Alignment Procedure", "Unless SA and SG share a common oscillator, their frequencies will not match exactly and very likely will result in data that is garbage for sweeps with low RBW.\nWe can compensate for this mismatch in software by finding the difference between SA and SG frequencies and using this value to offset the SA frequency relative to the SG frequency.\n\nSteps:\n1) Connect devices.\n2) Disable SG tracking.\n3) Manually set SG to the center frequency of your desired sweep.\n\t*Note that the frequency must be set to something evenly divisible by your SG's smallest frequency step. (Ex. HP8673B has 4kHz steps so center freq should be divisible by 4kHz.\n4) Set start/stop frequencies to be just a bit wider than the anticipated frequency offset. +/-8kHz may be good to start with and adjust accordingly.\n5) Set number of sweep points. This will also vary case-by-base, but 40-60 points is usually good.\n6) Set RBW. Typically, #Points=(SweepRange/RBW)\n7) Perform sweep.\n8) Determine where the signal peak is and calculate the difference between the expected frequency and the measured frequency.\n9) Enter this value in the Analyzer Freq Offset box.\n\nAlternatively, connect devices, set the SG frequency box (or the start/stop frequencies) and press Auto Align Offset. This parks the SG, takes one narrow sweep on the SA and fills in the offset automatically.")
 
     def show_about(self):
         QMessageBox.about(self, "About", "SweeperGUI\nCreated with PyQt5.")
 
     def closeEvent(self, event):
         self.save_config()
+        self.device_manager.wait_for_discovery()
         self.device_manager.disconnect_devices()
+        self.sweep_model.close_session()
+        self.disable_file_logging()
+        self.drain_log()
         super().closeEvent(event)
 
 def main():
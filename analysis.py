@@ -2,26 +2,14 @@ import numpy as np
 import os
 import csv
 import datetime
+import sqlite3
+from results_db import PEAK_COLUMNS, open_results_database
 
-def load_compensation_file(filename):
-    """Loads a compensation file with frequency and dB pairs."""
-    if not os.path.exists(filename):
-        print(f"Warning: Compensation file '{filename}' not found. No compensation will be applied.")
-        return None, None
-    try:
-        data = np.loadtxt(filename, delimiter=',', skiprows=1)
-        freqs, dbs = data[:, 0], data[:, 1]
-        print(f"Successfully loaded compensation file: {filename}")
-        return freqs, dbs
-    except Exception as e:
-        print(f"Error loading compensation file '{filename}': {e}")
-        return None, None
-
-def get_compensation(freq_hz, comp_freqs, comp_dbs):
-    """Calculates compensation for a given frequency using linear interpolation."""
-    if comp_freqs is None or comp_dbs is None or len(comp_freqs) == 0:
-        return 0.0
-    return np.interp(freq_hz, comp_freqs, comp_dbs)
+def get_compensation(freqs_hz, compensation):
+    """Returns the compensation at each frequency, or zeros if compensation is None."""
+    if compensation is None:
+        return np.zeros(len(freqs_hz))
+    return compensation(freqs_hz)
 
 def dbm_to_watts_formatted(dbm):
     """Converts dBm to a formatted string in W, mW, or µW."""
@@ -91,73 +79,54 @@ def get_search_range(carrier_freq_hz):
 
 def get_next_measurement_index(filename='peak_report.csv'):
     """
-    Calculates the next measurement index by reading a CSV file.
-    If the file doesn't exist, it returns 0. Otherwise, it returns
-    the highest index found + 1.
+    Returns the next measurement index for a peak report: 0 for a new
+    report, otherwise the highest index recorded + 1. The index is looked
+    up in the report's results database, or in the CSV if the database
+    cannot be read.
     """
-    if not os.path.exists(filename):
-        return 0
-    
+    try:
+        with open_results_database(filename) as db:
+            return db.next_measurement_index()
+    except (sqlite3.Error, OSError) as e:
+        print(f"\nError reading the results database for {filename}: {e}")
+        return _next_measurement_index_from_csv(filename)
+
+def _next_measurement_index_from_csv(filename):
+    """Returns the highest measurement index in a peak report CSV + 1, or 0 if it has none."""
     max_index = -1
     try:
         with open(filename, 'r', newline='') as f:
-            reader = csv.reader(f)
-            try:
-                header = next(reader)
+            for row in csv.DictReader(f):
                 try:
-                    idx_col = header.index('measurement_index')
-                except ValueError:
-                    print(f"Warning: 'measurement_index' column not found in {filename}. Assuming index 0.")
-                    return 0
-            except StopIteration:
-                return 0 # File is empty
-
-            for row in reader:
-                try:
-                    if row:
-                        current_index = int(row[idx_col])
-                        if current_index > max_index:
-                            max_index = current_index
-                except (ValueError, IndexError):
-                    continue
-    except IOError:
-        print(f"Warning: Could not read {filename}. Assuming index 0.")
-        return 0
-
+                    max_index = max(max_index, int(row['measurement_index']))
+                except (KeyError, ValueError, TypeError):
+                    pass
+    except OSError:
+        pass
     return max_index + 1
 
-def append_peaks_to_csv(carrier_peaks, spurious_peaks, comp_freqs, comp_dbs, note, filename='peak_report.csv', measurement_index=None, timestamp=None):
-    """Appends a list of carrier and spurious peaks to a CSV file."""
+def append_peaks_to_csv(carrier_peaks, spurious_peaks, compensation, note, filename='peak_report.csv', measurement_index=None, timestamp=None):
+    """
+    Appends a list of carrier and spurious peaks to the CSV file, then
+    records them in the results database behind it. compensation is a
+    CompensationTable, or None. The CSV is written even if the database
+    cannot be opened or written.
+    """
     if measurement_index is None:
         measurement_index = get_next_measurement_index(filename)
     if timestamp is None:
         timestamp = datetime.datetime.now().isoformat()
     
-    fieldnames = [
-        'measurement_index', 'timestamp', 'peak_type', 
-        'frequency_hz', 'measured_power_dbm', 'compensation_db', 'corrected_power_dbm',
-        'note'
-    ]
-    
-    rows_to_write = []
-    
-    for freq, power in carrier_peaks:
-        comp_db = get_compensation(freq, comp_freqs, comp_dbs)
-        corrected_power = power - comp_db
-        rows_to_write.append({
-            'measurement_index': measurement_index, 'timestamp': timestamp, 'peak_type': 'carrier',
-            'frequency_hz': freq, 'measured_power_dbm': power,
-            'compensation_db': comp_db, 'corrected_power_dbm': corrected_power,
-            'note': note
-        })
+    peaks = [('carrier', freq, power) for freq, power in carrier_peaks]
+    peaks += [('spurious', freq, power) for freq, power in spurious_peaks]
+    comp_dbs = get_compensation(np.array([freq for _, freq, _ in peaks], dtype=float), compensation)
 
-    for freq, power in spurious_peaks:
-        comp_db = get_compensation(freq, comp_freqs, comp_dbs)
-        corrected_power = power - comp_db
+    rows_to_write = []
+    for (peak_type, freq, power), comp_db in zip(peaks, comp_dbs):
         rows_to_write.append({
-            'measurement_index': measurement_index, 'timestamp': timestamp, 'peak_type': 'spurious',
-            'frequency_hz': freq, 'measured_power_dbm': power,
-            'compensation_db': comp_db, 'corrected_power_dbm': corrected_power,
+            'measurement_index': measurement_index, 'timestamp': timestamp, 'peak_type': peak_type,
+            'frequency_hz': float(freq), 'measured_power_dbm': float(power),
+            'compensation_db': float(comp_db), 'corrected_power_dbm': float(power - comp_db),
             'note': note
         })
 
@@ -167,7 +136,7 @@ def append_peaks_to_csv(carrier_peaks, spurious_peaks, comp_freqs, comp_dbs, not
     file_exists = os.path.exists(filename)
     try:
         with open(filename, 'a', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer = csv.DictWriter(f, fieldnames=PEAK_COLUMNS)
             if not file_exists:
                 writer.writeheader()
             writer.writerows(rows_to_write)
@@ -175,6 +144,13 @@ def append_peaks_to_csv(carrier_peaks, spurious_peaks, comp_freqs, comp_dbs, not
     except IOError as e:
         print(f"\nError writing to {filename}: {e}")
 
+    # A new database imports the CSV, rows just appended included; add_peaks skips those.
+    try:
+        with open_results_database(filename) as db:
+            db.add_peaks(rows_to_write)
+    except (sqlite3.Error, OSError) as e:
+        print(f"\nError writing to the results database for {filename}: {e}")
+
 def separate_carrier_and_spurious(peaks, carrier_freq):
     """Separates a list of peaks into carrier and spurious signals."""
     carrier_peaks, spurious_peaks = [], []
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+async def run_sweep_async(sa, sg, frequencies, sg_tracking_disabled=False, sa_freq_offset=0, log_callback=None,
+                          power_mode='marker'):
+    """
+    Async counterpart of sweep_utils.run_sweep. Use it with `async for`.
+
+    The SG settle and the SA retune for each point are awaited together, so
+    they overlap on the two instrument threads.
+
+    Args:
+        sa: AsyncSpectrumAnalyzer instance.
+        sg: AsyncSignalGenerator instance.
+        frequencies: A list or array of frequencies to sweep.
+        sg_tracking_disabled (bool): If True, the SG frequency is not changed.
+        sa_freq_offset (int): Frequency offset for the spectrum analyzer.
+        log_callback: A function to call for logging messages. Per-point
+                      progress is logged to this module's logger at DEBUG level.
+        power_mode (str): 'marker' or 'trace_mean', see SpectrumAnalyzer.measure_power.
+    """
+    if log_callback is None:
+        log_callback = print
+
+    start_time = time.time()
+    sweep_timeout_s = await sa.get_sweep_timeout()
+    for freq in frequencies:
+        sa_freq = freq + sa_freq_offset
+        if sg_tracking_disabled:
+            power = await sa.measure_at(sa_freq, power_mode, sweep_timeout_s)
+        else:
+            logger.debug("Setting SG freq: %s", freq)
+            settle_time, _ = await asyncio.gather(sg.set_frequency_and_settle(freq + sa_freq_offset),
+                                                  sa.set_center_frequency(sa_freq))
+            logger.debug("  SG settle: %.0f ms", settle_time * 1e3)
+            await sa.take_sweep_and_wait(sweep_timeout_s)
+            power = await sa.measure_power(power_mode)
+        logger.debug("  Power: %.2f dBm", power)
+        yield freq, power
+
+    stop_time = time.time()
+    log_callback(f"Done running sweep. Sweep took {int(stop_time-start_time)} seconds.")
+
+class EventLoopThread:
+    """
+    Runs an asyncio event loop on a background thread so synchronous code,
+    such as the Qt GUI, can drive the async instrument API.
+
+    Example:
+        loop_thread = EventLoopThread()
+        future = loop_thread.submit(some_coroutine())
+        future.add_done_callback(...)
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="asyncio-loop", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine):
+        """Schedules a coroutine on the loop and returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def stop(self):
+        """Stops the loop and waits for the thread to exit."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
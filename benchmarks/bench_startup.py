@@ -0,0 +1,96 @@
+"""
+Startup time benchmarks.
+
+Starts a fresh interpreter for each entry point and reports how long the
+whole process took to import it (or, for the GUI, to build and show the
+main window), against a budget. Headless entry points are also checked for
+loading Qt, pyqtgraph, matplotlib or pandas, which they must only do
+lazily. No instruments are needed.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup --repeat 3 --check
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Budgets for the whole process, in seconds.
+HEADLESS_BUDGET_S = 0.5
+GUI_BUDGET_S = 2.0
+
+HEADLESS_MODULES = (
+    'sweep_engine', 'sweep_planner', 'sweep_data', 'sweep_store', 'session_store', 'analysis', 'results_db',
+    'compensation', 'visa_utils', 'spectrum_analyzer', 'sweep_analysis', 'generate_compensation', 'calibrate_offset',
+)
+# Modules too slow to load at startup in headless tools.
+HEAVY_MODULES = ('PyQt5', 'pyqtgraph', 'matplotlib', 'pandas')
+
+IMPORT_PROBE = """
+import sys
+import {module}
+print(' '.join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+GUI_PROBE = """
+import sys
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv)
+import SweeperGUI
+window = SweeperGUI.MainWindow()
+window.show()
+print('')
+"""
+
+
+def time_process(code, repeat):
+    """Runs code in fresh interpreters, returning the best wall time and the last output."""
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env)
+        elapsed = time.perf_counter() - start
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else "failed")
+        best = min(best, elapsed)
+    lines = completed.stdout.strip().splitlines()
+    return best, lines[-1] if lines else ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time benchmarks.")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per entry point; the fastest counts.")
+    parser.add_argument('--check', action='store_true', help="Exit with an error if any budget is exceeded.")
+    parser.add_argument('--no-gui', action='store_true', help="Skip the SweeperGUI window benchmark.")
+    args = parser.parse_args()
+
+    entries = [(module, IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES), HEADLESS_BUDGET_S)
+               for module in HEADLESS_MODULES]
+    if not args.no_gui:
+        entries.append(('SweeperGUI window', GUI_PROBE, GUI_BUDGET_S))
+
+    failures = 0
+    print(f"{'entry point':<24}{'seconds':>9}{'budget':>8}  result")
+    for name, code, budget in entries:
+        try:
+            elapsed, heavy = time_process(code, args.repeat)
+        except RuntimeError as e:
+            print(f"{name:<24}{'':>9}{budget:>8.2f}  skipped: {e}")
+            continue
+        problems = []
+        if elapsed > budget:
+            problems.append("over budget")
+        if heavy:
+            problems.append(f"loads {heavy}")
+        failures += bool(problems)
+        print(f"{name:<24}{elapsed:>9.3f}{budget:>8.2f}  {', '.join(problems) or 'ok'}")
+
+    if args.check and failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Sweep throughput benchmarks against the simulated bench in sim/.
+
+Reports points/second and bus transactions/point for run_sweep (with plain
+drivers and with instrument actors), continuous interpolation mode,
+find_peaks_emc and the compensation generator. With --bus-log, every bus
+transaction is recorded with a BusMonitor and written to a JSON or CSV file.
+
+Run from the repository root:
+    python -m benchmarks.bench_sweep --latency 0.002 --sweep-time 0.02 --points 50
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+
+from devices.bus_monitor import BusMonitor
+from devices.instrument_actor import InstrumentActor
+from sim import simulated_bench
+
+
+def open_simulated_bench(args):
+    sa, sg = simulated_bench.open_simulated_bench('HP8593EM', args.latency, args.per_byte, args.sweep_time)
+    if args.monitor is not None:
+        sa.set_monitor(args.monitor)
+        sg.set_monitor(args.monitor)
+    return sa, sg
+
+
+def count_transactions(*drivers):
+    return sum(driver.instrument.transactions for driver in drivers)
+
+
+def bench_run_sweep(args, use_actors=False):
+    from sweep_utils import run_sweep
+
+    sa, sg = open_simulated_bench(args)
+    if use_actors:
+        sa, sg = InstrumentActor(sa), InstrumentActor(sg)
+    frequencies = np.linspace(10e9, 10.01e9, args.points)
+    start_transactions = count_transactions(sa, sg)
+    start = time.perf_counter()
+    results = list(run_sweep(sa, sg, frequencies, log_callback=lambda message: None))
+    elapsed = time.perf_counter() - start
+    transactions = count_transactions(sa, sg) - start_transactions
+    sa.close()
+    sg.close()
+    return len(results), elapsed, transactions
+
+
+def bench_continuous(args):
+    from sweep_engine import SweepEngine
+
+    sa, sg = open_simulated_bench(args)
+    measured = []
+
+    def on_result(freq, power):
+        measured.append(freq)
+        if len(measured) >= args.points:
+            engine.stop()
+
+    engine = SweepEngine(sa, sg, [], sg_tracking_disabled=False, sa_freq_offset=0, power=-40, rbw=1000,
+                         mode='continuous', start_freq=10e9, stop_freq=10.01e9,
+                         result_callback=on_result, log_callback=lambda message: None)
+    start = time.perf_counter()
+    engine.run()
+    elapsed = time.perf_counter() - start
+    transactions = count_transactions(sa, sg)
+    sa.close()
+    sg.close()
+    return len(measured), elapsed, transactions
+
+
+def bench_find_peaks(args):
+    sa, sg = open_simulated_bench(args)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        peaks = sa.find_peaks_emc()
+    elapsed = time.perf_counter() - start
+    transactions = count_transactions(sa)
+    sa.close()
+    sg.close()
+    return len(peaks), elapsed, transactions
+
+
+def bench_compensation(args):
+    from generate_compensation import generate_frequency_ranges, measure_frequency_ranges
+
+    sa, sg = open_simulated_bench(args)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        measured_ranges, _, _ = measure_frequency_ranges(sa, generate_frequency_ranges(1e6, 1e9), settle_time_s=0)
+    elapsed = time.perf_counter() - start
+    transactions = count_transactions(sa)
+    sa.close()
+    sg.close()
+    return sum(len(points) for points in measured_ranges), elapsed, transactions
+
+
+BENCHMARKS = {
+    'run_sweep': bench_run_sweep,
+    'run_sweep_actors': lambda args: bench_run_sweep(args, use_actors=True),
+    'continuous': bench_continuous,
+    'find_peaks_emc': bench_find_peaks,
+    'compensation': bench_compensation,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep throughput benchmarks on the simulated bench.")
+    parser.add_argument('--latency', type=float, default=0.002, help="Per-transaction bus latency in seconds.")
+    parser.add_argument('--per-byte', type=float, default=2e-6, help="Transfer time per byte in seconds.")
+    parser.add_argument('--sweep-time', type=float, default=0.02, help="Simulated sweep time in seconds.")
+    parser.add_argument('--points', type=int, default=50, help="Points per sweep benchmark.")
+    parser.add_argument('benchmarks', nargs='*', help=f"Benchmarks to run (default: all). One of {list(BENCHMARKS)}.")
+    parser.add_argument('--bus-log', help="Record bus traffic to this .json or .csv file.")
+    args = parser.parse_args()
+    args.monitor = BusMonitor() if args.bus_log else None
+
+    names = args.benchmarks or list(BENCHMARKS)
+    print(f"{'benchmark':<18}{'points':>8}{'seconds':>10}{'points/s':>10}{'trans/pt':>10}")
+    for name in names:
+        try:
+            points, elapsed, transactions = BENCHMARKS[name](args)
+        except ImportError as e:
+            print(f"{name:<18} skipped: {e}")
+            continue
+        print(f"{name:<18}{points:>8}{elapsed:>10.3f}{points / elapsed:>10.1f}{transactions / max(points, 1):>10.2f}")
+
+    if args.monitor is not None:
+        args.monitor.export(args.bus_log)
+        print(f"\nBus log written to {args.bus_log}")
+        print(args.monitor.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import json
+import os
+
+import pyvisa
+from devices.hp8593em import HP8593EM
+from devices.hp8673b import HP8673B
+from sweep_utils import find_frequency_offset, parse_frequency
+from visa_utils import discover_and_connect
+
+CONFIG_FILE = "config.json"
+
+
+def save_offset_to_config(offset):
+    """Stores the offset in the SweeperGUI config file so the GUI picks it up."""
+    config = {}
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, 'r') as f:
+            config = json.load(f)
+    config["sa_freq_offset"] = str(offset)
+    with open(CONFIG_FILE, 'w') as f:
+        json.dump(config, f, indent=4)
+    print(f"Saved offset to {CONFIG_FILE}.")
+
+
+def main():
+    """
+    Measures the SA/SG frequency offset in one step: parks the SG, takes one
+    narrow sweep on the SA and interpolates the peak location.
+    """
+    sa = None
+    sg = None
+
+    try:
+        device_map = {
+            '8593EM': HP8593EM,
+            '8673B': HP8673B
+        }
+        found_devices = discover_and_connect(device_map)
+        sa = found_devices['8593EM']
+        sg = found_devices['8673B']
+        print("Successfully connected to both devices.")
+
+        freq_str = input("Enter SG frequency to calibrate at (a multiple of the SG step, e.g. 24.192GHz): ")
+        span_str = input("Enter SA span (optional, default is 20kHz): ")
+        power_str = input("Enter SG power in dBm (optional, default is -40): ")
+
+        freq = parse_frequency(freq_str)
+        span = parse_frequency(span_str) if span_str else 20e3
+        power = int(power_str) if power_str else -40
+
+        with sg.batch():
+            sg.set_power(power)
+            sg.enable_rf(True)
+
+        offset = find_frequency_offset(sa, sg, freq, span_hz=span)
+        print(f"\nAnalyzer frequency offset: {offset} Hz")
+
+        if input(f"Save offset to {CONFIG_FILE} for SweeperGUI? [y/N]: ").strip().lower() == 'y':
+            save_offset_to_config(offset)
+
+    except (pyvisa.errors.VisaIOError, ConnectionError) as e:
+        print(f"Error communicating with instrument: {e}")
+    except ValueError:
+        print("Invalid frequency, span or power.")
+    finally:
+        if sa:
+            sa.close()
+        if sg:
+            sg.enable_rf(False)
+            sg.close()
+        print("Connections closed.")
+
+if __name__ == "__main__":
+    main()
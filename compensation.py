@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+
+# Suffix of the binary copy kept next to each compensation CSV.
+CACHE_SUFFIX = ".npz"
+
+
+class CompensationTable:
+    """
+    Frequency-dependent correction, in dB, for the path between the device
+    under test and the analyzer: cables, attenuators, antenna factors.
+    Corrected power is the measured power minus the table value.
+
+    Points are validated and sorted once when the table is built, and
+    duplicate frequencies are averaged, so looking values up is a single
+    np.interp over any number of frequencies. Tables for parts in series are
+    combined with chain().
+    """
+    def __init__(self, frequencies, dbs, name=""):
+        frequencies = np.asarray(frequencies, dtype=float)
+        dbs = np.asarray(dbs, dtype=float)
+        if frequencies.ndim != 1 or frequencies.shape != dbs.shape:
+            raise ValueError("Compensation frequencies and values must be 1-D arrays of the same length.")
+        if len(frequencies) == 0:
+            raise ValueError("Compensation table is empty.")
+        if not (np.all(np.isfinite(frequencies)) and np.all(np.isfinite(dbs))):
+            raise ValueError("Compensation table contains values that are not numbers.")
+
+        self.frequencies, index = np.unique(frequencies, return_inverse=True)
+        self.dbs = np.bincount(index, weights=dbs) / np.bincount(index)
+        self.name = name
+
+    def __len__(self):
+        return len(self.frequencies)
+
+    def __call__(self, freq_hz):
+        """Returns the compensation at freq_hz, which may be a number or an array. Held flat past either end."""
+        return np.interp(freq_hz, self.frequencies, self.dbs)
+
+    def correct(self, freq_hz, power_dbm):
+        """Returns the measured power_dbm at freq_hz with the compensation removed."""
+        return np.asarray(power_dbm) - self(freq_hz)
+
+    @classmethod
+    def chain(cls, tables):
+        """
+        Combines tables for parts in series into one table whose value is the
+        sum of theirs, sampled at every frequency of every table.
+        """
+        tables = list(tables)
+        if len(tables) == 1:
+            return tables[0]
+        frequencies = np.unique(np.concatenate([table.frequencies for table in tables]))
+        dbs = sum(table(frequencies) for table in tables)
+        return cls(frequencies, dbs, " + ".join(table.name for table in tables))
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Loads a CSV of frequency (Hz) and dB pairs with one header line.
+
+        The parsed table is cached in filename + CACHE_SUFFIX, tagged with the
+        CSV's modification time and size, and reused until the CSV changes.
+        """
+        stat = os.stat(filename)
+        cache_path = filename + CACHE_SUFFIX
+        try:
+            with np.load(cache_path) as cache:
+                if cache['mtime_ns'] == stat.st_mtime_ns and cache['size'] == stat.st_size:
+                    return cls(cache['frequencies'], cache['dbs'], filename)
+        except (OSError, KeyError, ValueError):
+            pass
+
+        data = np.loadtxt(filename, delimiter=',', skiprows=1, ndmin=2)
+        if data.shape[1] < 2:
+            raise ValueError(f"Expected frequency and dB columns in {filename}.")
+        table = cls(data[:, 0], data[:, 1], filename)
+        try:
+            with open(cache_path, 'wb') as f:
+                np.savez(f, frequencies=table.frequencies, dbs=table.dbs,
+                         mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        except OSError as e:
+            print(f"Warning: Could not cache compensation table '{cache_path}': {e}")
+        return table
+
+
+def load_compensation_files(filenames):
+    """
+    Loads and chains the compensation files that exist, warning about the
+    rest. Returns the combined CompensationTable, or None if none loaded.
+    """
+    tables = []
+    for filename in filenames:
+        if not os.path.exists(filename):
+            print(f"Warning: Compensation file '{filename}' not found. It will not be applied.")
+            continue
+        try:
+            tables.append(CompensationTable.load(filename))
+            print(f"Successfully loaded compensation file: {filename}")
+        except (OSError, ValueError) as e:
+            print(f"Error loading compensation file '{filename}': {e}")
+    return CompensationTable.chain(tables) if tables else None
@@ -3,27 +3,41 @@ from devices.hp8563a import HP8563A
 from devices.hp8593em import HP8593EM
 from devices.hp8673b import HP8673B
 
-def create_spectrum_analyzer(resource, log_callback=print):
+# Driver classes, keyed by a string found in the instrument's ID? response.
+SPECTRUM_ANALYZER_MODELS = {'8563A': HP8563A, '8593EM': HP8593EM}
+SIGNAL_GENERATOR_MODELS = {'8673B': HP8673B}
+
+def identify_model(identity, models=None):
+    """Returns the driver class for an ID? response, or None if it is not a supported instrument."""
+    if models is None:
+        models = {**SPECTRUM_ANALYZER_MODELS, **SIGNAL_GENERATOR_MODELS}
+    for device_id, device_class in models.items():
+        if device_id in identity:
+            return device_class
+    return None
+
+def create_spectrum_analyzer(resource, log_callback=print, identity=None):
     """
     Factory function to create a spectrum analyzer instance based on its ID.
 
     Args:
         resource: An opened pyvisa resource.
         log_callback: A function for logging.
+        identity: The device's ID? response, if already known from discovery.
+                  Queried from the device otherwise.
 
     Returns:
         An instance of a SpectrumAnalyzer subclass, or None if the device is not supported.
     """
     try:
-        idn = resource.query("ID?").strip()
-        log_callback(f"Queried ID for {resource.resource_name}: {idn}")
-        if "8563A" in idn:
-            return HP8563A(resource)
-        elif "8593EM" in idn:
-            return HP8593EM(resource)
-        else:
-            log_callback(f"Device with ID '{idn}' is not a supported SA.")
+        if identity is None:
+            identity = resource.query("ID?").strip()
+            log_callback(f"Queried ID for {resource.resource_name}: {identity}")
+        device_class = identify_model(identity, SPECTRUM_ANALYZER_MODELS)
+        if device_class is None:
+            log_callback(f"Device with ID '{identity}' is not a supported SA.")
             return None
+        return device_class(resource)
     except pyvisa.errors.VisaIOError as e:
         log_callback(f"VISA Error querying ID for {resource.resource_name}: {e}")
         return None
@@ -1,32 +1,128 @@
 import pyvisa
-from PyQt5.QtCore import QObject, pyqtSignal
-from device_factory import create_spectrum_analyzer
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from device_factory import create_spectrum_analyzer, identify_model
 from devices.hp8673b import HP8673B
+from devices.instrument_actor import InstrumentActor
+from instrument_cache import InstrumentCache
+from visa_utils import IDENTIFY_TIMEOUT_MS, discover_instruments, list_gpib_resources
+
+class DiscoveryWorker(QObject):
+    """Runs DeviceManager.discover_devices on a worker thread."""
+    finished = pyqtSignal()
+
+    def __init__(self, device_manager, use_cache):
+        super().__init__()
+        self.device_manager = device_manager
+        self.use_cache = use_cache
+
+    def run(self):
+        try:
+            self.device_manager.discover_devices(self.use_cache)
+        finally:
+            self.finished.emit()
 
 class DeviceManager(QObject):
     log = pyqtSignal(str)
-    devices_discovered = pyqtSignal(list)
+    devices_discovered = pyqtSignal(dict) # address -> model name, '' if it did not answer
     connection_status_changed = pyqtSignal(bool, str, str) # connected, sa_id, sg_id
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.rm = pyvisa.ResourceManager()
+        self._rm = None
         self.sa = None
         self.sg = None
         self.connected = False
+        self.sa_id = ""
+        self.sg_id = ""
+        self.bus_monitor = None
+        # ID? responses from the last discovery, keyed by address.
+        self.identities = {}
+        self.identify_timeout_ms = IDENTIFY_TIMEOUT_MS
+        self.instrument_cache = InstrumentCache()
+        self.discovery_thread = None
+        self.discovery_worker = None
+
+    @property
+    def rm(self):
+        """The VISA resource manager, created on first use because loading a VISA backend can be slow."""
+        if self._rm is None:
+            self._rm = pyvisa.ResourceManager()
+        return self._rm
+
+    def set_bus_monitor(self, monitor):
+        """Records the bus traffic of the connected instruments with a BusMonitor, or stops when monitor is None."""
+        self.bus_monitor = monitor
+        for instrument in (self.sa, self.sg):
+            if instrument:
+                instrument.set_monitor(monitor)
 
-    def discover_devices(self):
-        self.log.emit("Discovering devices...")
+    def start_discovery(self, use_cache=False):
+        """
+        Runs discover_devices on a worker thread, so the window stays
+        responsive while the bus is probed. The result arrives through
+        devices_discovered.
+        """
+        if self.discovery_thread is not None:
+            self.log.emit("Device discovery is already running.")
+            return
+        self.discovery_thread = QThread()
+        self.discovery_worker = DiscoveryWorker(self, use_cache)
+        self.discovery_worker.moveToThread(self.discovery_thread)
+
+        self.discovery_thread.started.connect(self.discovery_worker.run)
+        self.discovery_worker.finished.connect(self.discovery_thread.quit)
+        self.discovery_worker.finished.connect(self.discovery_worker.deleteLater)
+        self.discovery_thread.finished.connect(self.discovery_thread.deleteLater)
+        self.discovery_thread.finished.connect(self._on_discovery_thread_finished)
+        self.discovery_thread.start()
+
+    def _on_discovery_thread_finished(self):
+        self.discovery_thread = None
+        self.discovery_worker = None
+
+    def wait_for_discovery(self):
+        """Blocks until a running discovery finishes, e.g. before closing."""
+        if self.discovery_thread is not None:
+            self.discovery_thread.wait()
+
+    def discover_devices(self, use_cache=False):
+        """
+        Lists the GPIB addresses and identifies the instruments on them,
+        probing every address at once. With use_cache, the instruments in
+        the instrument cache are verified instead, and the bus is only
+        probed if any of them has changed.
+        Returns an address -> model name map of every listed address, with
+        '' for addresses that did not answer ID?.
+        """
         try:
-            # On some systems, finding the resource can be slow, so we need to be patient
-            found_devices = [r for r in self.rm.list_resources() if "GPIB" in r]
-            self.log.emit(f"Found GPIB devices: {found_devices}")
-            self.devices_discovered.emit(found_devices)
-            return found_devices
+            self.identities = {}
+            resources = list_gpib_resources(self.rm)
+            if use_cache:
+                cached = self.instrument_cache.identities()
+                if cached and discover_instruments(self.rm, list(cached), self.identify_timeout_ms) == cached:
+                    self.log.emit("Found the cached devices.")
+                    self.identities = cached
+            if not self.identities:
+                self.log.emit("Discovering devices...")
+                self.identities = discover_instruments(self.rm, resources, self.identify_timeout_ms)
+                self.instrument_cache.replace(self.identities)
+            for address, identity in self.identities.items():
+                self.instrument_cache.record(address, identity)
+            self.instrument_cache.save()
         except Exception as e:
             self.log.emit(f"Error discovering devices: {e}")
-            self.devices_discovered.emit([])
-            return []
+            self.identities = {}
+            self.devices_discovered.emit({})
+            return {}
+
+        found_devices = {address: "" for address in resources}
+        for address, identity in self.identities.items():
+            device_class = identify_model(identity)
+            found_devices[address] = device_class.__name__ if device_class else identity
+        found_devices = dict(sorted(found_devices.items()))
+        self.log.emit(f"Found GPIB devices: {found_devices}")
+        self.devices_discovered.emit(found_devices)
+        return found_devices
 
     def connect_devices(self, sa_addr, sg_addr, sa_model_name, sg_model_name):
         if self.connected:
@@ -35,17 +131,22 @@ class DeviceManager(QObject):
         self.log.emit(f"Connecting to SA at {sa_addr} and SG at {sg_addr}...")
         try:
             sa_resource = self.rm.open_resource(sa_addr)
-            self.sa = create_spectrum_analyzer(sa_resource, log_callback=self.log.emit)
+            sa = create_spectrum_analyzer(sa_resource, log_callback=self.log.emit,
+                                          identity=self.identities.get(sa_addr))
 
-            if not self.sa:
+            if not sa:
                 self.log.emit(f"Error: Could not connect to a supported SA at {sa_addr}")
                 sa_resource.close()
                 self.connection_status_changed.emit(False, "", "")
                 return
+            # Each instrument gets its own actor thread, so the GUI and the
+            # sweep worker can share them safely and the SG and SA can work
+            # at the same time.
+            self.sa = InstrumentActor(sa)
 
             sg_resource = self.rm.open_resource(sg_addr)
             if sg_model_name == "HP8673B":
-                self.sg = HP8673B(sg_resource)
+                self.sg = InstrumentActor(HP8673B(sg_resource))
             else:
                 self.log.emit(f"Unsupported Signal Generator: {sg_model_name}")
                 self.sa.close()
@@ -53,11 +154,17 @@ class DeviceManager(QObject):
                 self.connection_status_changed.emit(False, "", "")
                 return
 
+            if self.bus_monitor:
+                self.set_bus_monitor(self.bus_monitor)
+
             self.connected = True
-            sa_id = self.sa.get_id()
-            sg_id = self.sg.get_id()
-            self.log.emit(f"Connected to SA: {sa_id} and SG: {sg_id}")
-            self.connection_status_changed.emit(True, sa_id, sg_id)
+            self.sa_id = self.sa.get_id().strip()
+            self.sg_id = self.sg.get_id().strip()
+            self.instrument_cache.record(sa_addr, self.sa_id, type(sa).__name__)
+            self.instrument_cache.record(sg_addr, self.sg_id, sg_model_name)
+            self.instrument_cache.save()
+            self.log.emit(f"Connected to SA: {self.sa_id} and SG: {self.sg_id}")
+            self.connection_status_changed.emit(True, self.sa_id, self.sg_id)
 
         except pyvisa.errors.VisaIOError as e:
             self.log.emit(f"Error connecting to devices: {e}")
@@ -0,0 +1,74 @@
+import asyncio
+import time
+from devices.instrument_actor import InstrumentActor
+
+class AsyncInstrument:
+    """
+    asyncio front end for an instrument driver. Every driver method is
+    available as a coroutine; the blocking VISA call runs on the instrument's
+    actor thread, which acts as a single-thread executor, so calls stay
+    serialized while several instruments can be awaited together with
+    asyncio.gather. Cancelling a call that has not started yet removes it
+    from the queue.
+    """
+    def __init__(self, instrument):
+        if isinstance(instrument, InstrumentActor):
+            self._actor = instrument
+        else:
+            self._actor = InstrumentActor(instrument)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        attr = getattr(self._actor.driver, name)
+        if not callable(attr):
+            return attr
+
+        async def method(*args, **kwargs):
+            return await self.run(lambda driver: getattr(driver, name)(*args, **kwargs))
+        method.__name__ = name
+        return method
+
+    @property
+    def actor(self):
+        """The InstrumentActor, for synchronous callers sharing the instrument."""
+        return self._actor
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs fn(driver, *args, **kwargs) on the instrument thread and awaits the result."""
+        return await asyncio.wrap_future(self._actor.submit(fn, *args, **kwargs))
+
+    async def close(self):
+        """Closes the driver and stops the instrument thread."""
+        await asyncio.get_running_loop().run_in_executor(None, self._actor.close)
+
+class AsyncSpectrumAnalyzer(AsyncInstrument):
+    """asyncio counterpart of SpectrumAnalyzer."""
+
+    async def measure_at(self, freq_hz, power_mode='marker', sweep_timeout_s=None):
+        """Retunes, sweeps and reads the power as a single job on the instrument thread."""
+        def _measure(driver):
+            with driver.batch():
+                driver.set_center_frequency(freq_hz)
+                driver.take_sweep_and_wait(sweep_timeout_s)
+            return driver.measure_power(power_mode)
+        return await self.run(_measure)
+
+class AsyncSignalGenerator(AsyncInstrument):
+    """asyncio counterpart of SignalGenerator."""
+
+    async def set_frequency_and_settle(self, frequency_hz):
+        """
+        Sets the frequency and awaits the settle time. Unlike the synchronous
+        version, the instrument thread is free while waiting.
+        """
+        settle_time = await self.run(lambda driver: driver.retune(frequency_hz))
+        driver = self._actor.driver
+        if driver.monitor is None:
+            await asyncio.sleep(settle_time)
+        else:
+            timestamp = time.time()
+            start = time.perf_counter()
+            await asyncio.sleep(settle_time)
+            driver.monitor.record(driver.monitor_source, 'settle', None, timestamp, time.perf_counter() - start)
+        return settle_time
@@ -0,0 +1,215 @@
+import bisect
+import csv
+import json
+import re
+import threading
+import time
+from collections import deque
+
+# Leading mnemonic of a command, e.g. "CF" for "CF 1000000Hz" or "MKA?".
+MNEMONIC = re.compile(r"[*A-Za-z]+\??")
+
+# Upper edges of the latency histogram buckets, in seconds. Durations above
+# the last edge go into an overflow bucket.
+HISTOGRAM_EDGES_S = (1e-4, 2e-4, 5e-4, 1e-3, 2e-3, 5e-3, 1e-2, 2e-2, 5e-2, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+# Operations that wait on the instrument rather than move data over the bus.
+WAIT_OPERATIONS = ('settle', 'sweep_wait')
+
+RECORD_FIELDS = ('timestamp', 'source', 'operation', 'command', 'mnemonic', 'duration_s', 'bytes_out', 'bytes_in',
+                 'error', 'nested')
+
+
+def command_mnemonic(operation, command):
+    """Returns the histogram key for a command: the mnemonic of each ';'-separated part."""
+    if not command:
+        return f"<{operation}>"
+    mnemonics = []
+    for part in command.split(';'):
+        match = MNEMONIC.match(part.strip())
+        if match:
+            mnemonics.append(match.group(0))
+    return ";".join(mnemonics) or f"<{operation}>"
+
+
+def _size(value):
+    return len(value) if isinstance(value, (str, bytes, bytearray)) else 0
+
+
+class LatencyHistogram:
+    """Latency distribution and byte counts for one command mnemonic."""
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.min_s = float('inf')
+        self.max_s = 0.0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.buckets = [0] * (len(HISTOGRAM_EDGES_S) + 1)
+
+    def add(self, duration_s, bytes_out, bytes_in, error):
+        self.count += 1
+        self.errors += error is not None
+        self.total_s += duration_s
+        self.min_s = min(self.min_s, duration_s)
+        self.max_s = max(self.max_s, duration_s)
+        self.bytes_out += bytes_out
+        self.bytes_in += bytes_in
+        self.buckets[bisect.bisect_left(HISTOGRAM_EDGES_S, duration_s)] += 1
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total_s': self.total_s,
+            'mean_s': self.total_s / self.count if self.count else 0.0,
+            'min_s': self.min_s if self.count else 0.0,
+            'max_s': self.max_s,
+            'bytes_out': self.bytes_out,
+            'bytes_in': self.bytes_in,
+            'bucket_edges_s': list(HISTOGRAM_EDGES_S),
+            'buckets': list(self.buckets),
+        }
+
+
+class BusMonitor:
+    """
+    Records GPIB transactions made by instrument drivers.
+
+    Attach it with set_monitor() on a spectrum analyzer or signal generator.
+    Every write, read, query, binary read and serial poll is recorded with its
+    start time, duration, bytes in and out and any error, along with the
+    'settle' waits of the signal generator and the 'sweep_wait' waits for the
+    end of a sweep. A sweep_wait record spans the serial polls made while
+    waiting; those are recorded as nested and are not counted twice in the
+    time breakdown.
+
+    Per-mnemonic latency histograms cover every record; the record list keeps
+    the most recent max_records. One monitor can be shared by drivers on
+    different threads.
+    """
+    def __init__(self, max_records=100000):
+        self.records = deque(maxlen=max_records)
+        self.histograms = {}
+        # Time of the operations not nested inside another, by category.
+        self._time_totals = self._empty_breakdown()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @staticmethod
+    def _empty_breakdown():
+        breakdown = {'bus': 0.0}
+        breakdown.update((operation, 0.0) for operation in WAIT_OPERATIONS)
+        return breakdown
+
+    def track(self, source, operation, command, fn, *args):
+        """
+        Runs fn(*args) as one bus operation and records it. Returns fn's result.
+        Operations tracked by fn itself on the same thread are recorded as nested.
+        """
+        depth = getattr(self._local, 'depth', 0)
+        timestamp = time.time()
+        start = time.perf_counter()
+        self._local.depth = depth + 1
+        try:
+            result = fn(*args)
+        except Exception as e:
+            self.record(source, operation, command, timestamp, time.perf_counter() - start,
+                        bytes_out=_size(command), error=repr(e), nested=depth > 0)
+            raise
+        finally:
+            self._local.depth = depth
+        self.record(source, operation, command, timestamp, time.perf_counter() - start,
+                    bytes_out=_size(command), bytes_in=_size(result), nested=depth > 0)
+        return result
+
+    def record(self, source, operation, command, timestamp, duration_s, bytes_out=0, bytes_in=0, error=None,
+               nested=False):
+        """Adds one operation. nested marks one made inside another recorded operation, e.g. a poll during a wait."""
+        mnemonic = command_mnemonic(operation, command)
+        with self._lock:
+            self.records.append({
+                'timestamp': timestamp,
+                'source': source,
+                'operation': operation,
+                'command': command,
+                'mnemonic': mnemonic,
+                'duration_s': duration_s,
+                'bytes_out': bytes_out,
+                'bytes_in': bytes_in,
+                'error': error,
+                'nested': nested,
+            })
+            if not nested:
+                self._time_totals[operation if operation in WAIT_OPERATIONS else 'bus'] += duration_s
+            key = (source, mnemonic)
+            if key not in self.histograms:
+                self.histograms[key] = LatencyHistogram()
+            self.histograms[key].add(duration_s, bytes_out, bytes_in, error)
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+            self.histograms.clear()
+            self._time_totals = self._empty_breakdown()
+
+    def get_histograms(self):
+        """Returns one dict per (source, mnemonic), slowest total first."""
+        with self._lock:
+            rows = [{'source': source, 'mnemonic': mnemonic, **histogram.to_dict()}
+                    for (source, mnemonic), histogram in self.histograms.items()]
+        return sorted(rows, key=lambda row: row['total_s'], reverse=True)
+
+    def get_time_breakdown(self):
+        """
+        Splits the recorded time into bus transfers and waits. Nested
+        operations count only within the operation around them, so the
+        total does not exceed the time spent.
+
+        Returns:
+            A dict mapping 'bus' and each wait operation ('settle',
+            'sweep_wait') to total seconds.
+        """
+        with self._lock:
+            return dict(self._time_totals)
+
+    def summary(self):
+        """Returns a text table of the per-mnemonic statistics."""
+        lines = [f"{'source':<12}{'mnemonic':<20}{'count':>8}{'total s':>10}{'mean ms':>10}{'max ms':>10}"
+                 f"{'bytes in':>10}{'errors':>8}"]
+        for row in self.get_histograms():
+            lines.append(f"{row['source']:<12}{row['mnemonic']:<20}{row['count']:>8}{row['total_s']:>10.3f}"
+                         f"{row['mean_s'] * 1e3:>10.2f}{row['max_s'] * 1e3:>10.2f}{row['bytes_in']:>10}"
+                         f"{row['errors']:>8}")
+        breakdown = self.get_time_breakdown()
+        lines.append("Time: " + ", ".join(f"{name} {seconds:.3f} s" for name, seconds in breakdown.items()))
+        return "\n".join(lines)
+
+    def to_json(self, filepath):
+        """Writes the records, histograms and time breakdown to a JSON file."""
+        with self._lock:
+            records = list(self.records)
+        data = {
+            'records': records,
+            'histograms': self.get_histograms(),
+            'time_breakdown': self.get_time_breakdown(),
+        }
+        with open(filepath, 'w') as f:
+            json.dump(data, f, indent=2)
+
+    def to_csv(self, filepath):
+        """Writes the records to a CSV file, one transaction per row."""
+        with self._lock:
+            records = list(self.records)
+        with open(filepath, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=RECORD_FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+
+    def export(self, filepath):
+        """Writes CSV when filepath ends in .csv, JSON otherwise."""
+        if filepath.lower().endswith('.csv'):
+            self.to_csv(filepath)
+        else:
+            self.to_json(filepath)
@@ -1,7 +1,10 @@
 from devices.spectrum_analyzer import SpectrumAnalyzer
-import time
 
 class HP8563A(SpectrumAnalyzer):
+    TRACE_POINTS = 601
+    TRACE_REFERENCE_UNITS = 600
+    TRACE_UNITS_PER_DIVISION = 60
+
     def __init__(self, resource_or_address):
         super().__init__(resource_or_address)
 
@@ -11,7 +14,7 @@ class HP8563A(SpectrumAnalyzer):
     def reset(self):
         """Resets the instrument and configures it for measurements."""
         self.write("*RST")
-        time.sleep(1)
+        self.wait_done()
         self.write("AT AUTO")
         self.write("AUNITS DBM")
 
@@ -54,6 +57,13 @@ class HP8563A(SpectrumAnalyzer):
     def set_reference_level(self, level_dbm):
         self.write(f"RL {level_dbm}DBM")
 
+    def get_reference_level(self):
+        return float(self.query("RL?"))
+
+    def get_log_scale(self):
+        """Returns the log amplitude scale in dB/division."""
+        return float(self.query("LG?"))
+
     def set_trace_data_format(self, format_char):
         self.write(f"TDF {format_char}")
 
@@ -68,8 +78,22 @@ class HP8563A(SpectrumAnalyzer):
         self.write(f"ST {sweep_time}")
 
     def get_trace_data(self, trace_num):
+        """Reads trace A as ASCII parameter units, the format left set by every trace read."""
+        self.write("TDF P")
         return self.query(f"TA?")
 
     def wait_done(self):
         """Queries whether previous task has completed."""
         return self.query(f"DONE?")
+
+    def get_trace_binary(self, trace_num=1):
+        """
+        Reads trace A or B as 2-byte display units (600 = reference level).
+        The trace format is set back to ASCII afterwards.
+        """
+        trace = "AB"[trace_num - 1]
+        self.write("TDF B")
+        try:
+            return self.read_binary_words(f"TR{trace}?", self.TRACE_POINTS)
+        finally:
+            self.write("TDF P")
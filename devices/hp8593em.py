@@ -3,6 +3,20 @@ import time
 import pyvisa as visa
 
 class HP8593EM(SpectrumAnalyzer):
+    TRACE_POINTS = 401
+    TRACE_REFERENCE_UNITS = 8000
+    TRACE_UNITS_PER_DIVISION = 1000
+
+    # SIGLEN? polling backoff while an EMC measurement runs.
+    MEASUREMENT_POLL_INITIAL_S = 0.05
+    MEASUREMENT_POLL_MAX_S = 0.25
+    # Signals whose results are requested in one bus message. Groups of 16
+    # have only been run on the simulated bench; raise this once larger
+    # groups are confirmed not to overrun the analyzer's output buffer.
+    SIGNALS_PER_MESSAGE = 4
+    # Wait before retrying a signal after a bus error.
+    SIGNAL_RETRY_INTERVAL_S = 0.2
+
     def __init__(self, resource_or_address):
         super().__init__(resource_or_address)
 
@@ -12,16 +26,17 @@ class HP8593EM(SpectrumAnalyzer):
     def reset(self):
         """Resets the instrument and configures it for EMC peak measurements."""
         self.write("*RST")
-        time.sleep(1)
+        self.wait_done()
         self.write("MODE EMC")
-        time.sleep(1)
-        self.write("AT AUTO")
-        self.write("ARNG ON")
-        self.write("AUNITS DBM")
-        self.write("SIGLIST ON")
-        self.write("SIGDEL ALL")
-        self.write("AUTOQPD OFF")
-        self.write("AUTOAVG OFF")
+        self.wait_done()
+        with self.batch():
+            self.write("AT AUTO")
+            self.write("ARNG ON")
+            self.write("AUNITS DBM")
+            self.write("SIGLIST ON")
+            self.write("SIGDEL ALL")
+            self.write("AUTOQPD OFF")
+            self.write("AUTOAVG OFF")
 
     def set_center_frequency(self, freq_hz):
         self.write(f"CF {freq_hz}Hz")
@@ -53,6 +68,13 @@ class HP8593EM(SpectrumAnalyzer):
     def set_reference_level(self, level_dbm):
         self.write(f"RL {level_dbm}DBM")
 
+    def get_reference_level(self):
+        return float(self.query("RL?"))
+
+    def get_log_scale(self):
+        """Returns the log amplitude scale in dB/division."""
+        return float(self.query("LG?"))
+
     def set_preset_mode(self):
         self.write("*RST")
 
@@ -60,14 +82,9 @@ class HP8593EM(SpectrumAnalyzer):
         self.write("CONTSWP OFF")
 
     def get_marker_power(self):
-        # This is a bit of a hack for the 8593EM.
-        # We read the entire trace and return the first point.
-        # This is slow and inefficient.
-        # A better way might be to use markers, but for now this works.
-        self.write("TDF P")
-        trace_data = self.query("TRA?")
-        power_values = trace_data.split(',')
-        return float(power_values[0])
+        # Place a normal marker at the center of the trace and read its
+        # amplitude in one message instead of downloading the whole trace.
+        return float(self.query("MKN;MKA?"))
 
     def set_sweep_time(self, sweep_time):
         self.write(f"SWPT {sweep_time}")
@@ -102,57 +119,114 @@ class HP8593EM(SpectrumAnalyzer):
         return float(self.query("SWPT?"))
 
     def get_trace_data(self, trace_num):
+        """Reads trace A as ASCII parameter units, the format left set by every trace read."""
+        self.write("TDF P")
         return self.query(f"TA?")
 
+    def get_trace_binary(self, trace_num=1):
+        """
+        Reads trace A, B or C as 2-byte measurement units (8000 = reference
+        level). The trace format is set back to ASCII afterwards; MDS only
+        applies to the binary formats, so it is left as it is.
+        """
+        trace = "ABC"[trace_num - 1]
+        self.write("MDS W")
+        self.write("TDF B")
+        try:
+            return self.read_binary_words(f"TR{trace}?", self.TRACE_POINTS)
+        finally:
+            self.write("TDF P")
+
     def _wait_for_measurement(self, timeout=600):
         """Waits for a measurement to complete, returning the number of signals found."""
         print("Measurement in progress...")
         start_time = time.time()
-        wait_interval = 2
+        # Poll quickly at first and back off, so a finished measurement is
+        # noticed within MEASUREMENT_POLL_MAX_S without flooding the bus.
+        wait_interval = self.MEASUREMENT_POLL_INITIAL_S
         while time.time() - start_time < timeout:
             try:
                 num_signals = int(self.query("SIGLEN?"))
                 if num_signals > 0:
                     print(f"Measurement complete. Found {num_signals} signals.")
                     return num_signals
-                else:
-                    print("Waiting for signals...")
-                    time.sleep(wait_interval * 5)
             except visa.errors.VisaIOError:
-                time.sleep(wait_interval)
+                pass
             except ValueError:
                  print("Warning: Could not parse number of signals. Retrying...")
-                 time.sleep(wait_interval)
+            time.sleep(wait_interval)
+            wait_interval = min(wait_interval * 2, self.MEASUREMENT_POLL_MAX_S)
 
         print("Error: Timed out waiting for measurement to complete.")
         return 0
 
     def _fetch_signal_data(self, num_signals, timeout=600):
-        """Fetches the data for each signal from the instrument."""
+        """
+        Fetches the data for each signal from the instrument.
+
+        The SIGPOS/SIGRESULT? pairs for SIGNALS_PER_MESSAGE signals are sent
+        as one message and the results read back in order, so a signal costs
+        one read rather than a write and a query. Signals of a group that
+        hits a bus error are fetched again one at a time.
+        """
         signals = {}
-        i = 1
+        print(f"Fetching {num_signals} signals...")
+        for first in range(1, num_signals + 1, self.SIGNALS_PER_MESSAGE):
+            positions = range(first, min(first + self.SIGNALS_PER_MESSAGE, num_signals + 1))
+            try:
+                with self.batch():
+                    for i in positions:
+                        self.write(f"SIGPOS {i}")
+                        self.write("SIGRESULT?")
+                for i in positions:
+                    signals[i] = self.read()
+            except visa.errors.VisaIOError:
+                print(f"Warning: VISA error fetching signals {positions[0]}-{positions[-1]}. Retrying one at a time...")
+                self._clear_output()
+
         start_time = time.time()
-        wait_interval = 2
-        
-        while i <= num_signals and time.time() - start_time < timeout:
+        missing = [i for i in range(1, num_signals + 1) if i not in signals]
+        while missing and time.time() - start_time < timeout:
+            i = missing[0]
             try:
-                self.write(f"SIGPOS {i}")
-                print(f"Fetching signal {i} of {num_signals}...")
-                signals[i] = self.query("SIGRESULT?")
-                i += 1
+                with self.batch():
+                    self.write(f"SIGPOS {i}")
+                    signals[i] = self.query("SIGRESULT?")
+                missing.pop(0)
             except visa.errors.VisaIOError:
                 print(f"Warning: VISA error fetching signal {i}. Retrying...")
-                time.sleep(wait_interval)
+                time.sleep(self.SIGNAL_RETRY_INTERVAL_S)
 
         if len(signals) < num_signals:
             print(f"Warning: Timed out getting all signals. Only got {len(signals)} of {num_signals}.")
 
-        return signals
+        return dict(sorted(signals.items()))
+
+    def _clear_output(self):
+        """Discards unread results after a failed transfer."""
+        try:
+            self.instrument.clear()
+        except (AttributeError, NotImplementedError, visa.errors.VisaIOError):
+            pass
+
+    def _clear_signal_list(self):
+        """Deletes the signals of earlier measurements. Returns True once SIGLEN? confirms the list is empty."""
+        try:
+            with self.batch():
+                self.write("SIGDEL ALL")
+                return int(self.query("SIGLEN?")) == 0
+        except (visa.errors.VisaIOError, ValueError):
+            return False
 
     def find_peaks_emc(self):
         """Finds peaks using the EMC analyzer's auto-measure function."""
+        # With the signal list confirmed empty, any signal count polled
+        # afterwards comes from this measurement, so polling can start
+        # right away.
+        if not self._clear_signal_list():
+            print("Error: Could not clear the signal list before measuring.")
+            return []
         self.write("MEASALLSIGS")
-        time.sleep(1)
         
         num_signals = self._wait_for_measurement()
         if num_signals == 0:
@@ -1,7 +1,20 @@
+import bisect
 import pyvisa
 from devices.signal_generator import SignalGenerator
 
 class HP8673B(SignalGenerator):
+    # Program codes end in their own unit or state suffix, so batched
+    # commands can be sent back to back.
+    COMMAND_SEPARATOR = ""
+
+    # The YIG oscillator is harmonically mixed into these bands; crossing an
+    # edge switches bands and needs the full settle time.
+    BAND_EDGES_HZ = (2.0e9, 6.6e9, 12.3e9, 18.6e9)
+    BAND_SWITCH_SETTLE_S = 0.1
+    # Within a band the settle time grows with the step size.
+    MIN_SETTLE_S = 0.005
+    SETTLE_S_PER_HZ = 0.02 / 1e9
+
     def __init__(self, resource_or_address):
         super().__init__(resource_or_address)
 
@@ -9,19 +22,29 @@ class HP8673B(SignalGenerator):
         return "HP8673B"
 
     def set_frequency(self, frequency_hz):
-        self.instrument.write(f"CW{int(frequency_hz)}HZ")
+        self.write(f"CW{int(frequency_hz)}HZ")
+        self._last_frequency = frequency_hz
 
     def get_frequency(self):
-        return self.instrument.query(f"CW?")
+        return self.query(f"CW?")
+
+    def get_settle_time(self, from_hz, to_hz):
+        if from_hz is None or self._band(from_hz) != self._band(to_hz):
+            return self.BAND_SWITCH_SETTLE_S
+        step_settle = self.MIN_SETTLE_S + abs(to_hz - from_hz) * self.SETTLE_S_PER_HZ
+        return min(step_settle, self.BAND_SWITCH_SETTLE_S)
+
+    def _band(self, frequency_hz):
+        return bisect.bisect_right(self.BAND_EDGES_HZ, frequency_hz)
 
     def set_power(self, power_dbm):
-        self.instrument.write(f"PL{int(power_dbm)}DB")
+        self.write(f"PL{int(power_dbm)}DB")
 
     def enable_rf(self, enabled: bool):
         if enabled:
-            self.instrument.write("RF1")
+            self.write("RF1")
         else:
-            self.instrument.write("RF0")
+            self.write("RF0")
 
 if __name__ == '__main__':
     rm = pyvisa.ResourceManager()
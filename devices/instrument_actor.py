@@ -0,0 +1,140 @@
+import queue
+import sys
+import threading
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+class InstrumentActor:
+    """
+    Owns an instrument driver and runs every call to it on one dedicated
+    thread. Callers on any thread get serialized access, and operations on
+    different instruments can run at the same time.
+
+    Driver methods can be called on the actor directly and block until they
+    complete. submit() queues a call and returns a Future instead, so a caller
+    can overlap work on several instruments.
+    """
+    def __init__(self, driver):
+        self._driver = driver
+        self._queue = queue.Queue()
+        # The thread whose batch() is open, and how deeply it is nested.
+        # Calls from other threads wait in _deferred until it closes.
+        self._batch_owner = None
+        self._batch_depth = 0
+        self._deferred = deque()
+        self._thread = threading.Thread(target=self._run, name=f"{type(driver).__name__}-actor", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        attr = getattr(self._driver, name)
+        if not callable(attr):
+            return attr
+
+        def method(*args, **kwargs):
+            return self.call(lambda driver: getattr(driver, name)(*args, **kwargs))
+        method.__name__ = name
+        return method
+
+    @property
+    def driver(self):
+        """The wrapped driver. Only use it from inside submit()/call() functions."""
+        return self._driver
+
+    def _run(self):
+        while True:
+            if self._batch_owner is None and self._deferred:
+                item = self._deferred.popleft()
+            else:
+                item = self._queue.get()
+            if item is None:
+                break
+            future, fn, args, kwargs, owner = item
+            if self._batch_owner is not None and owner != self._batch_owner:
+                self._deferred.append(item)
+                continue
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(self._driver, *args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def submit(self, fn, *args, **kwargs):
+        """Queues fn(driver, *args, **kwargs) on the actor thread and returns a Future."""
+        future = Future()
+        self._queue.put((future, fn, args, kwargs, threading.get_ident()))
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        """Runs fn(driver, *args, **kwargs) on the actor thread and returns its result."""
+        if threading.current_thread() is self._thread:
+            return fn(self._driver, *args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    @contextmanager
+    def batch(self):
+        """
+        Runs the driver's batch() around the block on the actor thread.
+
+        Only calls made by the thread that opened the batch go into it.
+        Calls from other threads wait until the block closes and then run
+        in the order they were made.
+        """
+        owner = threading.get_ident()
+
+        def open_batch(driver):
+            batch_context = driver.batch()
+            batch_context.__enter__()
+            self._batch_owner = owner
+            self._batch_depth += 1
+            return batch_context
+
+        def close_batch(driver, *exc_info):
+            try:
+                batch_context.__exit__(*exc_info)
+            finally:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self._batch_owner = None
+
+        batch_context = self.call(open_batch)
+        try:
+            yield self
+        except BaseException:
+            self.call(close_batch, *sys.exc_info())
+            raise
+        self.call(close_batch, None, None, None)
+
+    def close(self):
+        """Closes the driver and stops the actor thread."""
+        try:
+            self.call(lambda driver: driver.close())
+        finally:
+            self._queue.put(None)
+            if threading.current_thread() is not self._thread:
+                self._thread.join()
+
+def submit(instrument, fn, *args, **kwargs):
+    """
+    Runs fn(driver, *args, **kwargs) on the instrument's actor thread, or
+    inline when the instrument is a plain driver. Returns a Future either way.
+    """
+    if isinstance(instrument, InstrumentActor):
+        return instrument.submit(fn, *args, **kwargs)
+    future = Future()
+    try:
+        future.set_result(fn(instrument, *args, **kwargs))
+    except BaseException as e:
+        future.set_exception(e)
+    return future
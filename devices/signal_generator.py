@@ -1,13 +1,28 @@
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 import pyvisa as visa
+import time
 
 class SignalGenerator(ABC):
+    # Joins batched commands into one message.
+    COMMAND_SEPARATOR = ";"
+
+    # Settle time used by drivers without a model of their synthesizer.
+    DEFAULT_SETTLE_TIME_S = 0.1
+
     def __init__(self, resource_or_address):
         if isinstance(resource_or_address, str):
             rm = visa.ResourceManager()
             self.instrument = rm.open_resource(resource_or_address)
         else:
             self.instrument = resource_or_address
+        self._batch_depth = 0
+        self._pending_commands = []
+        # Last programmed frequency, recorded by drivers with a settle model.
+        self._last_frequency = None
+        # Optional BusMonitor recording every bus transaction.
+        self.monitor = None
+        self.monitor_source = type(self).__name__
 
     def __enter__(self):
         return self
@@ -15,14 +30,59 @@ class SignalGenerator(ABC):
     def __exit__(self, exc_type, exc_value, traceback):
         self.close()
 
+    def set_monitor(self, monitor, source=None):
+        """Attaches a BusMonitor, or detaches it when monitor is None."""
+        self.monitor = monitor
+        if source is not None:
+            self.monitor_source = source
+
+    def _bus(self, operation, command, fn, *args):
+        """Runs one bus operation, recording it when a monitor is attached."""
+        if self.monitor is None:
+            return fn(*args)
+        return self.monitor.track(self.monitor_source, operation, command, fn, *args)
+
     def write(self, command):
-        self.instrument.write(command)
+        if self._batch_depth > 0:
+            self._pending_commands.append(command)
+            return
+        self._bus('write', command, self.instrument.write, command)
 
     def read(self):
-        return self.instrument.read()
+        self.flush()
+        return self._bus('read', None, self.instrument.read)
 
     def query(self, command):
-        return self.instrument.query(command)
+        # Any queued commands go out in the same message as the query.
+        if self._pending_commands:
+            self._pending_commands.append(command)
+            command = self.COMMAND_SEPARATOR.join(self._pending_commands)
+            self._pending_commands = []
+        return self._bus('query', command, self.instrument.query, command)
+
+    def flush(self):
+        """Sends any queued commands as a single message."""
+        if self._pending_commands:
+            message = self.COMMAND_SEPARATOR.join(self._pending_commands)
+            self._pending_commands = []
+            self._bus('write', message, self.instrument.write, message)
+
+    @contextmanager
+    def batch(self):
+        """
+        Queues the commands written inside the block and sends them as one
+        message when the outermost block exits.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._pending_commands = []
+            raise
+        finally:
+            self._batch_depth -= 1
+        if self._batch_depth == 0:
+            self.flush()
 
     def close(self):
         self.instrument.close()
@@ -39,6 +99,25 @@ class SignalGenerator(ABC):
     def get_frequency(self):
         pass
 
+    def get_settle_time(self, from_hz, to_hz):
+        """
+        Returns how long the output needs to settle after retuning. from_hz is
+        None when the previous frequency is unknown.
+        """
+        return self.DEFAULT_SETTLE_TIME_S
+
+    def retune(self, frequency_hz):
+        """Sets the frequency and returns how long to wait for it to settle, without waiting."""
+        settle_time = self.get_settle_time(self._last_frequency, frequency_hz)
+        self.set_frequency(frequency_hz)
+        return settle_time
+
+    def set_frequency_and_settle(self, frequency_hz):
+        """Sets the frequency and waits for the output to settle. Returns the wait used."""
+        settle_time = self.retune(frequency_hz)
+        self._bus('settle', None, time.sleep, settle_time)
+        return settle_time
+
     @abstractmethod
     def set_power(self, power_dbm):
         pass
@@ -1,8 +1,26 @@
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+import numpy as np
 import pyvisa as visa
 import time
 
 class SpectrumAnalyzer(ABC):
+    # Binary trace layout, overridden per driver: number of points in a trace,
+    # the trace value at the reference level (top graticule), and the number
+    # of trace units per vertical division.
+    TRACE_POINTS = 401
+    TRACE_REFERENCE_UNITS = 8000
+    TRACE_UNITS_PER_DIVISION = 1000
+
+    # Joins batched commands into one message.
+    COMMAND_SEPARATOR = ";"
+
+    # Status byte bit set at the end of a sweep, used to request service.
+    END_OF_SWEEP_STB_MASK = 4
+    # Backoff limits when the status byte has to be polled instead.
+    POLL_INITIAL_INTERVAL_S = 0.001
+    POLL_MAX_INTERVAL_S = 0.05
+
     def __init__(self, resource_or_address):
         if isinstance(resource_or_address, str):
             rm = visa.ResourceManager()
@@ -11,6 +29,12 @@ class SpectrumAnalyzer(ABC):
             self.instrument = resource_or_address
         
         self.instrument.timeout = 10000
+        self._batch_depth = 0
+        self._pending_commands = []
+        self._srq_supported = True
+        # Optional BusMonitor recording every bus transaction.
+        self.monitor = None
+        self.monitor_source = type(self).__name__
 
     def __enter__(self):
         return self
@@ -18,19 +42,72 @@ class SpectrumAnalyzer(ABC):
     def __exit__(self, exc_type, exc_value, traceback):
         self.close()
 
+    def set_monitor(self, monitor, source=None):
+        """Attaches a BusMonitor, or detaches it when monitor is None."""
+        self.monitor = monitor
+        if source is not None:
+            self.monitor_source = source
+
+    def _bus(self, operation, command, fn, *args):
+        """Runs one bus operation, recording it when a monitor is attached."""
+        if self.monitor is None:
+            return fn(*args)
+        return self.monitor.track(self.monitor_source, operation, command, fn, *args)
+
     def write(self, command):
-        #print(f"GPIB WRITE: {command}")
-        self.instrument.write(command)
+        if self._batch_depth > 0:
+            self._pending_commands.append(command)
+            return
+        self._bus('write', command, self.instrument.write, command)
 
     def read(self):
-        response = self.instrument.read()
-        #print(f"GPIB READ: {response.strip()}")
-        return response
+        self.flush()
+        return self._bus('read', None, self.instrument.read)
 
     def query(self, command):
-        response = self.instrument.query(command)
-        #print(f"GPIB QUERY '{command}': {response.strip()}")
-        return response
+        # Any queued commands go out in the same message as the query.
+        if self._pending_commands:
+            self._pending_commands.append(command)
+            command = self.COMMAND_SEPARATOR.join(self._pending_commands)
+            self._pending_commands = []
+        return self._bus('query', command, self.instrument.query, command)
+
+    def flush(self):
+        """Sends any queued commands as a single message."""
+        if self._pending_commands:
+            message = self.COMMAND_SEPARATOR.join(self._pending_commands)
+            self._pending_commands = []
+            self._bus('write', message, self.instrument.write, message)
+
+    @contextmanager
+    def batch(self):
+        """
+        Queues the commands written inside the block and sends them as one
+        message when the outermost block exits. A query inside the block is
+        sent together with the commands queued before it.
+
+        Example:
+            with sa.batch():
+                sa.set_center_frequency(f)
+                sa.take_sweep()
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._pending_commands = []
+            raise
+        finally:
+            self._batch_depth -= 1
+        if self._batch_depth == 0:
+            self.flush()
+
+    def read_binary_words(self, command, num_points):
+        """Sends a query and reads back a block of big-endian 16-bit words."""
+        self.write(command)
+        self.flush()
+        raw = self._bus('read_bytes', None, self.instrument.read_bytes, 2 * num_points)
+        return np.frombuffer(raw, dtype='>i2', count=num_points).astype(float)
 
     def close(self):
         self.instrument.close()
@@ -86,9 +163,49 @@ class SpectrumAnalyzer(ABC):
     def get_marker_power(self):
         pass
 
+    def get_trace_statistics(self, trace_num=1):
+        """
+        Summarises one binary trace transfer. In zero span every trace point is
+        a reading at the same frequency, so the mean is a noise-averaged power.
+
+        Returns:
+            A dict with 'mean' (averaged in linear power) and 'max' in dBm,
+            and 'std' in dB.
+        """
+        # The frequency axis is not needed, so skip the FA?/FB? queries.
+        _, powers = self.get_trace(trace_num, start_hz=0, stop_hz=0)
+        mean_mw = np.mean(10 ** (powers / 10))
+        return {
+            'mean': float(10 * np.log10(mean_mw)),
+            'max': float(np.max(powers)),
+            'std': float(np.std(powers)),
+        }
+
+    def measure_power(self, mode='marker'):
+        """
+        Reads the power at the current tuning.
+
+        Args:
+            mode (str): 'marker' for a single marker reading, or 'trace_mean'
+                        for the noise-averaged mean of the whole trace.
+        """
+        if mode == 'marker':
+            return self.get_marker_power()
+        elif mode == 'trace_mean':
+            return self.get_trace_statistics()['mean']
+        raise ValueError(f"Unknown power mode '{mode}'.")
+
     @abstractmethod
     def set_reference_level(self, level_dbm):
         pass
+
+    @abstractmethod
+    def get_reference_level(self):
+        pass
+
+    @abstractmethod
+    def get_log_scale(self):
+        pass
         
     @abstractmethod
     def set_trace_data_format(self, format_char):
@@ -98,11 +215,70 @@ class SpectrumAnalyzer(ABC):
     def take_sweep(self):
         pass
 
-    def take_sweep_and_wait(self):
-        sweep_time_s = self.get_sweep_time()
-        self.take_sweep()
-        # Wait for sweep to complete, with a small buffer
-        time.sleep(sweep_time_s * 1.1 + 0.1)
+    def take_sweep_and_wait(self, timeout_s=None):
+        """
+        Takes a sweep and returns as soon as the instrument reports the end of
+        the sweep. The timeout defaults to twice the current sweep time plus a
+        margin.
+        """
+        if timeout_s is None:
+            timeout_s = self.get_sweep_timeout()
+        with self.batch():
+            self.arm_service_request(self.END_OF_SWEEP_STB_MASK)
+            self.take_sweep()
+        # Also send the commands when called inside an outer batch.
+        self.flush()
+        self._bus('sweep_wait', None, self.wait_for_service_request, self.END_OF_SWEEP_STB_MASK, timeout_s)
+
+    def get_sweep_timeout(self):
+        """Returns a generous timeout for one sweep at the current settings."""
+        return self.get_sweep_time() * 2 + 5
+
+    def arm_service_request(self, mask):
+        """Clears the status byte and requests service when any of the mask bits is set."""
+        try:
+            self._bus('read_stb', None, self.instrument.read_stb)
+        except (AttributeError, NotImplementedError, visa.errors.VisaIOError):
+            pass
+        self.write(f"RQS {mask}")
+
+    def wait_for_service_request(self, mask, timeout_s):
+        """
+        Waits for a status bit armed with arm_service_request. Uses the GPIB SRQ
+        event when the backend supports it, otherwise polls the status byte
+        with a backoff, and as a last resort blocks on wait_done().
+        """
+        if self._srq_supported:
+            try:
+                self.instrument.wait_for_srq(int(timeout_s * 1000))
+                return
+            except visa.errors.VisaIOError as e:
+                if e.error_code == visa.constants.StatusCode.error_timeout:
+                    print("Warning: Timed out waiting for service request.")
+                    self.wait_done()
+                    return
+                self._srq_supported = False
+            except (AttributeError, NotImplementedError):
+                self._srq_supported = False
+
+        try:
+            if self._poll_status_byte(mask, timeout_s):
+                return
+            print("Warning: Timed out polling the status byte.")
+        except (AttributeError, NotImplementedError, visa.errors.VisaIOError):
+            pass
+        self.wait_done()
+
+    def _poll_status_byte(self, mask, timeout_s):
+        """Polls the status byte until a mask bit is set. Returns False on timeout."""
+        interval = self.POLL_INITIAL_INTERVAL_S
+        deadline = time.monotonic() + timeout_s
+        while time.monotonic() < deadline:
+            if self._bus('read_stb', None, self.instrument.read_stb) & mask:
+                return True
+            time.sleep(interval)
+            interval = min(interval * 2, self.POLL_MAX_INTERVAL_S)
+        return False
 
     @abstractmethod
     def get_sweep_time(self):
@@ -116,6 +292,40 @@ class SpectrumAnalyzer(ABC):
     def get_trace_data(self, trace_num):
         pass
 
+    @abstractmethod
+    def get_trace_binary(self, trace_num=1):
+        """
+        Reads a trace in the binary format, returned in raw trace units.
+        The instrument is left in its ASCII trace format, which the other
+        trace reads expect.
+        """
+        pass
+
+    def get_trace(self, trace_num=1, start_hz=None, stop_hz=None):
+        """
+        Reads a trace using a binary transfer and scales it to dBm.
+
+        Assumes a log amplitude scale. The start/stop frequencies are queried
+        from the instrument unless the caller already knows them.
+
+        Returns:
+            A (frequencies_hz, powers_dbm) tuple of NumPy arrays.
+        """
+        raw = self.get_trace_binary(trace_num)
+        reference_level = self.get_reference_level()
+        db_per_division = self.get_log_scale()
+        if db_per_division <= 0:
+            raise ValueError("Binary trace scaling requires a log amplitude scale.")
+
+        powers = reference_level + (raw - self.TRACE_REFERENCE_UNITS) * (db_per_division / self.TRACE_UNITS_PER_DIVISION)
+
+        if start_hz is None:
+            start_hz = self.get_start_frequency()
+        if stop_hz is None:
+            stop_hz = self.get_end_frequency()
+        frequencies = np.linspace(start_hz, stop_hz, len(powers))
+        return frequencies, powers
+
     @abstractmethod
     def wait_done(self):
         pass
@@ -1,12 +1,18 @@
+import argparse
 import numpy as np
 import pyvisa as visa
 import time
 import analysis
+from compensation import CompensationTable
 from devices.hp8593em import HP8593EM
-import pandas as pd
+from visa_utils import discover_and_connect
 import os
+import shutil
+from datetime import datetime
 
 COMPENSATION_FILE = 'ext_att_compensation.csv'
+# Every update saves the file it replaces here, for rolling back.
+HISTORY_DIR = 'compensation_history'
 
 def get_frequency_range():
     """Prompts user for start and end frequencies."""
@@ -25,28 +31,81 @@ def get_frequency_range():
         except (ValueError, IndexError):
             print("Invalid input. Please enter a valid frequency (e.g., '100mhz', '2.4g').")
 
-def update_compensation_file(new_points, filename):
+def merge_compensation(table, new_table):
     """
-    Adds new points to the compensation file, removing any existing points
-    within a 10% frequency tolerance.
+    Returns the frequencies and values of table with the span new_table
+    covers, from its lowest to its highest frequency, replaced by
+    new_table's points. Points outside that span are kept.
     """
-    if os.path.exists(filename):
-        df = pd.read_csv(filename, header=0, names=['frequency', 'attenuation'], comment='#')
-    else:
-        df = pd.DataFrame(columns=['frequency', 'attenuation'])
-
-    for freq, att in new_points:
-        # Remove existing points within 10% of the new frequency
-        df = df[~((df['frequency'] >= freq * 0.9) & (df['frequency'] <= freq * 1.1))]
-    
-    new_df = pd.DataFrame(new_points, columns=['frequency', 'attenuation'])
-    df = pd.concat([df, new_df], ignore_index=True)
-    df = df.sort_values(by='frequency').reset_index(drop=True)
-
-    with open(filename, 'w') as f:
+    if table is None:
+        return new_table.frequencies, new_table.dbs
+    lo = np.searchsorted(table.frequencies, new_table.frequencies[0], side='left')
+    hi = np.searchsorted(table.frequencies, new_table.frequencies[-1], side='right')
+    frequencies = np.concatenate([table.frequencies[:lo], new_table.frequencies, table.frequencies[hi:]])
+    dbs = np.concatenate([table.dbs[:lo], new_table.dbs, table.dbs[hi:]])
+    return frequencies, dbs
+
+def write_compensation_file(filename, frequencies, dbs):
+    """Writes a compensation file through a temporary file, so it is never left half written."""
+    temp_path = filename + ".tmp"
+    with open(temp_path, 'w') as f:
         f.write("# Frequency (Hz), Attenuation (dB)\n")
-        df.to_csv(f, index=False, header=False)
-    print(f"\nUpdated {filename} with {len(new_points)} new points.")
+        np.savetxt(f, np.column_stack([frequencies, dbs]), delimiter=',', fmt='%.12g')
+    os.replace(temp_path, filename)
+
+def save_compensation_version(filename, history_dir=HISTORY_DIR):
+    """Copies the current compensation file into history_dir. Returns the copy's path, or None if there is no file."""
+    if not os.path.exists(filename):
+        return None
+    os.makedirs(history_dir, exist_ok=True)
+    base, ext = os.path.splitext(os.path.basename(filename))
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    version_path = os.path.join(history_dir, f"{base}.{stamp}{ext}")
+    suffix = 1
+    while os.path.exists(version_path):
+        version_path = os.path.join(history_dir, f"{base}.{stamp}-{suffix}{ext}")
+        suffix += 1
+    shutil.copy2(filename, version_path)
+    return version_path
+
+def list_compensation_versions(filename, history_dir=HISTORY_DIR):
+    """Returns the saved versions of a compensation file, oldest first."""
+    if not os.path.isdir(history_dir):
+        return []
+    base, ext = os.path.splitext(os.path.basename(filename))
+    return sorted(os.path.join(history_dir, name) for name in os.listdir(history_dir)
+                  if name.startswith(base + ".") and name.endswith(ext))
+
+def rollback_compensation_file(filename, version_path, history_dir=HISTORY_DIR):
+    """
+    Restores a saved version of a compensation file. The current file is
+    saved as a new version first, so a rollback can itself be undone.
+    """
+    save_compensation_version(filename, history_dir)
+    # A plain copy gives the file a new modification time, which invalidates its cached table.
+    shutil.copy(version_path, filename)
+    print(f"Restored {filename} from {version_path}.")
+
+def update_compensation_file(measured_ranges, filename):
+    """
+    Merges newly measured sub-ranges, each a list of (frequency,
+    attenuation) points, into the compensation file. Existing points
+    within each measured sub-range are replaced; the rest of the file,
+    including sub-ranges that could not be measured, is kept. The previous
+    file is saved to HISTORY_DIR first.
+    """
+    table = CompensationTable.load(filename) if os.path.exists(filename) else None
+    num_points = 0
+    for points in measured_ranges:
+        new_table = CompensationTable([freq for freq, _ in points], [att for _, att in points])
+        table = CompensationTable(*merge_compensation(table, new_table), filename)
+        num_points += len(new_table)
+
+    version_path = save_compensation_version(filename)
+    if version_path:
+        print(f"\nSaved the previous compensation file as {version_path}.")
+    write_compensation_file(filename, table.frequencies, table.dbs)
+    print(f"\nUpdated {filename} with {num_points} new points in {len(measured_ranges)} sub-ranges.")
 
 def generate_frequency_ranges(start_freq, end_freq):
     """Splits a frequency range into sub-ranges with a max 10x span ratio."""
@@ -62,13 +121,101 @@ def generate_frequency_ranges(start_freq, end_freq):
         current_freq = span_end
     return ranges
 
+def measure_frequency_ranges(sa, frequency_ranges, settle_time_s=0.5):
+    """
+    Sweeps each sub-range with the tracking generator and collects the
+    measured attenuation.
+
+    Returns:
+        A (measured_ranges, min_atten, max_atten) tuple. measured_ranges has
+        a list of (frequency, attenuation) pairs for each sub-range that was
+        measured; sub-ranges that failed are left out. min_atten/max_atten
+        are (attenuation, frequency) pairs.
+    """
+    measured_ranges = []
+    
+    min_atten_overall = (float('inf'), 0)
+    max_atten_overall = (float('-inf'), 0)
+
+    for i, (sub_start_freq, sub_end_freq) in enumerate(frequency_ranges):
+        print(f"\n--- Measuring sub-range {i+1}/{len(frequency_ranges)}: {analysis.format_frequency(sub_start_freq)} to {analysis.format_frequency(sub_end_freq)} ---")
+
+        # Configure spectrum analyzer for a single sweep using center and span
+        center_freq = (sub_start_freq + sub_end_freq) / 2
+        span_freq = sub_end_freq - sub_start_freq
+        sa.set_center_frequency(center_freq)
+        sa.set_span(span_freq)
+        
+        # Verify the actual frequencies set on the analyzer
+        actual_start_freq = sa.get_start_frequency()
+        actual_end_freq = sa.get_end_frequency()
+
+        print(f"  Actual measurement range: {analysis.format_frequency(actual_start_freq)} to {analysis.format_frequency(actual_end_freq)}")
+        
+        sa.set_reference_level(0) # RL 0DBM
+        sa.set_tracking_generator_power(0) # SRCPWR 0DB
+        time.sleep(settle_time_s) # Wait for settings to apply
+
+        # Take a sweep and wait for it to complete
+        sa.take_sweep_and_wait()
+
+        # Get trace data as a binary transfer, already scaled to dB
+        try:
+            frequencies, attenuations = sa.get_trace(1, actual_start_freq, actual_end_freq)
+
+            measured_ranges.append(list(zip(frequencies, attenuations)))
+
+            min_index = np.argmin(attenuations)
+            max_index = np.argmax(attenuations)
+            if attenuations[min_index] < min_atten_overall[0]:
+                min_atten_overall = (attenuations[min_index], frequencies[min_index])
+            if attenuations[max_index] > max_atten_overall[0]:
+                max_atten_overall = (attenuations[max_index], frequencies[max_index])
+
+        except (ValueError, IndexError) as e:
+            print(f"  Could not parse attenuation data: {e}")
+        except visa.errors.VisaIOError as e:
+            print(f"  VISA error during measurement: {e}")
+
+    return measured_ranges, min_atten_overall, max_atten_overall
+
+def handle_history_commands(args):
+    """Lists or restores saved versions of the compensation file. Returns True if a command was given."""
+    versions = list_compensation_versions(COMPENSATION_FILE)
+    if args.list_versions:
+        if not versions:
+            print(f"No saved versions of {COMPENSATION_FILE} in {HISTORY_DIR}.")
+        for i, version_path in enumerate(versions):
+            print(f"{i:>3}  {version_path}")
+        return True
+    if args.rollback is not None:
+        if not versions:
+            print(f"No saved versions of {COMPENSATION_FILE} to roll back to.")
+        elif args.rollback == 'latest':
+            rollback_compensation_file(COMPENSATION_FILE, versions[-1])
+        elif args.rollback.isdigit() and int(args.rollback) < len(versions):
+            rollback_compensation_file(COMPENSATION_FILE, versions[int(args.rollback)])
+        elif os.path.exists(args.rollback):
+            rollback_compensation_file(COMPENSATION_FILE, args.rollback)
+        else:
+            print(f"Unknown version '{args.rollback}'. Use --list-versions to see the saved versions.")
+        return True
+    return False
+
 def main():
     """Main execution function."""
-    GPIB_ADDRESS = "GPIB0::18::INSTR"
+    parser = argparse.ArgumentParser(description="Measure external attenuation into the compensation file.")
+    parser.add_argument("--list-versions", action="store_true",
+                        help=f"list the saved versions of {COMPENSATION_FILE} and exit")
+    parser.add_argument("--rollback", nargs="?", const="latest", metavar="VERSION",
+                        help="restore a saved version, by number or path (default: the latest) and exit")
+    if handle_history_commands(parser.parse_args()):
+        return
+
     sa = None
 
     try:
-        sa = HP8593EM(GPIB_ADDRESS)
+        sa = discover_and_connect({'8593EM': HP8593EM})['8593EM']
         print(f"Connected to: {sa.get_id()}")
         
         if not sa.has_tracking_generator:
@@ -78,61 +225,13 @@ def main():
         start_freq, end_freq = get_frequency_range()
         
         frequency_ranges = generate_frequency_ranges(start_freq, end_freq)
-        all_compensation_points = []
-        
-        min_atten_overall = (float('inf'), 0)
-        max_atten_overall = (float('-inf'), 0)
-
-        for i, (sub_start_freq, sub_end_freq) in enumerate(frequency_ranges):
-            print(f"\n--- Measuring sub-range {i+1}/{len(frequency_ranges)}: {analysis.format_frequency(sub_start_freq)} to {analysis.format_frequency(sub_end_freq)} ---")
+        measured_ranges, min_atten_overall, max_atten_overall = measure_frequency_ranges(sa, frequency_ranges)
 
-            # Configure spectrum analyzer for a single sweep using center and span
-            center_freq = (sub_start_freq + sub_end_freq) / 2
-            span_freq = sub_end_freq - sub_start_freq
-            sa.set_center_frequency(center_freq)
-            sa.set_span(span_freq)
-            
-            # Verify the actual frequencies set on the analyzer
-            actual_start_freq = sa.get_start_frequency()
-            actual_end_freq = sa.get_end_frequency()
-
-            print(f"  Actual measurement range: {analysis.format_frequency(actual_start_freq)} to {analysis.format_frequency(actual_end_freq)}")
-            
-            sa.set_reference_level(0) # RL 0DBM
-            sa.set_tracking_generator_power(0) # SRCPWR 0DB
-            sa.set_trace_data_format('M') # TDF M
-            time.sleep(0.5) # Wait for settings to apply
-
-            # Take a sweep and wait for it to complete
-            sa.take_sweep_and_wait()
-
-            # Get trace data
-            try:
-                raw_data = sa.get_trace_data(1)
-                raw_points = [float(p) for p in raw_data.strip().split('\r')]
-                
-                attenuations = [(p / 100) - 80 for p in raw_points]
-                
-                num_points = len(attenuations)
-                frequencies = np.linspace(actual_start_freq, actual_end_freq, num_points)
-                
-                new_compensation_points = list(zip(frequencies, attenuations))
-                all_compensation_points.extend(new_compensation_points)
-
-                min_atten_segment = min(attenuations)
-                max_atten_segment = max(attenuations)
-                if min_atten_segment < min_atten_overall[0]:
-                    min_atten_overall = (min_atten_segment, frequencies[attenuations.index(min_atten_segment)])
-                if max_atten_segment > max_atten_overall[0]:
-                    max_atten_overall = (max_atten_segment, frequencies[attenuations.index(max_atten_segment)])
-
-            except (ValueError, IndexError) as e:
-                print(f"  Could not parse attenuation data: {e}")
-            except visa.errors.VisaIOError as e:
-                print(f"  VISA error during measurement: {e}")
-
-        if all_compensation_points:
-            update_compensation_file(all_compensation_points, COMPENSATION_FILE)
+        if len(measured_ranges) < len(frequency_ranges):
+            print(f"\n{len(frequency_ranges) - len(measured_ranges)} sub-ranges could not be measured; "
+                  f"their existing compensation points are kept.")
+        if measured_ranges:
+            update_compensation_file(measured_ranges, COMPENSATION_FILE)
 
             print("\n--- Overall Attenuation Summary ---")
             print(f"Minimum Attenuation: {min_atten_overall[0]:.2f} dB at {analysis.format_frequency(min_atten_overall[1])}")
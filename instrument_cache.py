@@ -0,0 +1,63 @@
+import json
+import os
+from datetime import datetime
+
+from sweep_utils import write_json_atomic
+
+CACHE_FILE = "instrument_cache.json"
+
+class InstrumentCache:
+    """
+    The instruments found on the bus before, saved between runs: each
+    address with its ID? response, driver class name and when it was last
+    seen.
+
+    Scripts look instruments up here and verify them with one ID? query
+    instead of probing the whole bus, so a fixed bench connects at once.
+    """
+    def __init__(self, filepath=CACHE_FILE):
+        self.filepath = filepath
+        self.entries = {}
+        if os.path.exists(filepath):
+            try:
+                with open(filepath, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not read instrument cache '{filepath}': {e}")
+
+    def find(self, device_id):
+        """Returns the most recently seen address whose identity contains device_id, or None."""
+        matches = [(entry['last_seen'], address) for address, entry in self.entries.items()
+                   if device_id in entry['identity']]
+        return max(matches)[1] if matches else None
+
+    def identities(self):
+        """Returns the cached address -> identity map."""
+        return {address: entry['identity'] for address, entry in self.entries.items()}
+
+    def record(self, address, identity, driver=None):
+        """Marks an instrument as seen now."""
+        previous = self.entries.get(address, {})
+        if previous.get('identity') != identity:
+            previous = {}
+        self.entries[address] = {
+            'identity': identity,
+            'driver': driver or previous.get('driver'),
+            'last_seen': datetime.now().isoformat(timespec='seconds'),
+        }
+
+    def replace(self, instruments, drivers=None):
+        """Replaces the cache with the results of a full discovery, an address -> identity map."""
+        drivers = drivers or {}
+        self.entries = {address: entry for address, entry in self.entries.items() if address in instruments}
+        for address, identity in instruments.items():
+            self.record(address, identity, drivers.get(address))
+
+    def forget(self, address):
+        self.entries.pop(address, None)
+
+    def save(self):
+        try:
+            write_json_atomic(self.filepath, self.entries)
+        except OSError as e:
+            print(f"Warning: Could not save instrument cache '{self.filepath}': {e}")
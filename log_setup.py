@@ -0,0 +1,84 @@
+import logging
+import logging.handlers
+from collections import deque
+
+LOG_FORMAT = "%(asctime)s.%(msecs)03d\t%(message)s"
+FILE_LOG_FORMAT = "%(asctime)s.%(msecs)03d %(levelname)-7s %(name)s: %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Libraries whose debug output would drown out ours.
+QUIET_LOGGERS = ('pyvisa', 'matplotlib', 'PyQt5')
+
+
+class BufferedHandler(logging.Handler):
+    """
+    Keeps log records in memory until drain() is called.
+
+    emit() only appends the record, so logging from a sweep thread costs no
+    formatting and no GUI work; the messages are formatted when a consumer
+    drains them, typically on a timer in the GUI thread. Only the newest
+    capacity records are kept.
+    """
+    def __init__(self, level=logging.INFO, capacity=10000):
+        super().__init__(level)
+        self.records = deque(maxlen=capacity)
+        self.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def drain(self):
+        """Removes the buffered records and returns them as formatted messages."""
+        messages = []
+        while self.records:
+            try:
+                record = self.records.popleft()
+            except IndexError:
+                break
+            messages.append(self.format(record))
+        return messages
+
+
+def _update_root_level():
+    """Lets through the lowest level any handler wants, so nothing below it is ever formatted."""
+    root = logging.getLogger()
+    levels = [handler.level for handler in root.handlers if handler.level > logging.NOTSET]
+    root.setLevel(min(levels) if levels else logging.WARNING)
+
+
+def add_handler(handler):
+    root = logging.getLogger()
+    if handler not in root.handlers:
+        root.addHandler(handler)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+    _update_root_level()
+
+
+def remove_handler(handler):
+    logging.getLogger().removeHandler(handler)
+    handler.close()
+    _update_root_level()
+
+
+def set_handler_level(handler, level):
+    handler.setLevel(level)
+    _update_root_level()
+
+
+def enable_console_logging(level=logging.INFO):
+    """Prints log messages at or above level to stderr, for the command line scripts. Returns the handler."""
+    handler = logging.StreamHandler()
+    handler.setLevel(level)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    add_handler(handler)
+    return handler
+
+
+def enable_file_logging(filepath, max_bytes=5 * 1024 * 1024, backup_count=3):
+    """Writes full debug detail to a rotating log file. Returns the handler."""
+    handler = logging.handlers.RotatingFileHandler(filepath, maxBytes=max_bytes, backupCount=backup_count)
+    handler.setLevel(logging.DEBUG)
+    handler.setFormatter(logging.Formatter(FILE_LOG_FORMAT, DATE_FORMAT))
+    add_handler(handler)
+    return handler
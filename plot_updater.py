@@ -0,0 +1,89 @@
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtCore import QObject, QTimer
+
+class PlotUpdater(QObject):
+    """
+    Redraws the sweep plot from a SweepModel at most MAX_FPS times a second.
+
+    Change notifications arriving between frames are coalesced into one
+    redraw. Each redraw only processes the points added since the last one:
+    they are appended to the scatter, and their 10 Hz groups are merged into
+    running sums, so the averaged curve is never recomputed from scratch.
+
+    With a CompensationTable set, the plotted power is corrected by it.
+    """
+    MAX_FPS = 10
+    # Width of the frequency groups averaged into the curve.
+    GROUP_WIDTH_HZ = 10
+
+    def __init__(self, sweep_model, scatter, curve, parent=None):
+        super().__init__(parent)
+        self.sweep_model = sweep_model
+        self.scatter = scatter
+        self.curve = curve
+        self.compensation = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(int(1000 / self.MAX_FPS))
+        self._timer.timeout.connect(self.refresh)
+        self._reset()
+        self.sweep_model.data_changed.connect(self.schedule_refresh)
+
+    def _reset(self):
+        self._generation = self.sweep_model.store.generation
+        self._plotted = 0
+        self._group_freqs = np.empty(0)
+        self._group_sums = np.empty(0)
+        self._group_counts = np.empty(0)
+
+    def set_compensation(self, compensation):
+        """Corrects the plot by a CompensationTable, or shows measured power if None. Redraws every point."""
+        self.compensation = compensation
+        self._generation = None
+        self.schedule_refresh()
+
+    def schedule_refresh(self):
+        """Requests a redraw on the next frame."""
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def refresh(self):
+        """Draws the points added since the last refresh."""
+        if self.sweep_model.store.generation != self._generation:
+            self._reset()
+            self.scatter.setData([], [])
+            self.curve.setData([], [])
+
+        # Only the new rows are read, so a loaded session is not copied.
+        sweep_data = self.sweep_model.get_snapshot(self._plotted)
+        new_freqs = sweep_data['frequency']
+        new_powers = sweep_data['power']
+        if len(new_freqs) == 0:
+            return
+        self._plotted += len(new_freqs)
+        if self.compensation is not None:
+            new_powers = self.compensation.correct(new_freqs, new_powers)
+
+        self.scatter.addPoints(x=new_freqs, y=new_powers)
+        self._merge_groups(new_freqs, new_powers)
+        self.curve.setData(self._group_freqs, self._group_sums / self._group_counts,
+                           pen=pg.mkPen(color='b', width=2), symbol=None)
+
+    def _merge_groups(self, freqs, powers):
+        """Adds points to the sorted running sums of their frequency groups."""
+        group_freqs = np.round(freqs / self.GROUP_WIDTH_HZ) * self.GROUP_WIDTH_HZ
+        groups, index = np.unique(group_freqs, return_inverse=True)
+        sums = np.bincount(index, weights=powers)
+        counts = np.bincount(index).astype(float)
+
+        positions = np.searchsorted(self._group_freqs, groups)
+        existing = positions < len(self._group_freqs)
+        existing[existing] = self._group_freqs[positions[existing]] == groups[existing]
+        self._group_sums[positions[existing]] += sums[existing]
+        self._group_counts[positions[existing]] += counts[existing]
+
+        new = ~existing
+        self._group_freqs = np.insert(self._group_freqs, positions[new], groups[new])
+        self._group_sums = np.insert(self._group_sums, positions[new], sums[new])
+        self._group_counts = np.insert(self._group_counts, positions[new], counts[new])
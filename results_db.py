@@ -0,0 +1,201 @@
+import argparse
+import csv
+import os
+import sqlite3
+
+PEAK_COLUMNS = (
+    'measurement_index', 'timestamp', 'peak_type',
+    'frequency_hz', 'measured_power_dbm', 'compensation_db', 'corrected_power_dbm',
+    'note'
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS peaks (
+    id INTEGER PRIMARY KEY,
+    measurement_index INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    peak_type TEXT NOT NULL,
+    frequency_hz REAL NOT NULL,
+    measured_power_dbm REAL NOT NULL,
+    compensation_db REAL NOT NULL,
+    corrected_power_dbm REAL NOT NULL,
+    note TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS peaks_measurement_index ON peaks (measurement_index);
+CREATE INDEX IF NOT EXISTS peaks_timestamp ON peaks (timestamp);
+CREATE INDEX IF NOT EXISTS peaks_frequency ON peaks (frequency_hz);
+CREATE INDEX IF NOT EXISTS peaks_note ON peaks (note);
+"""
+
+# A peak is identified by its measurement, time, type and frequency, so
+# importing the same report twice adds nothing.
+UNIQUE_KEY = ('measurement_index', 'timestamp', 'peak_type', 'frequency_hz')
+
+
+def database_path_for(csv_filename):
+    """Returns the database that backs a peak report CSV, e.g. peak_report.csv -> peak_report.db."""
+    return os.path.splitext(csv_filename)[0] + '.db'
+
+
+class ResultsDatabase:
+    """
+    Peak measurements in an SQLite database.
+
+    Every column a report is searched by (measurement index, timestamp,
+    frequency and note) is indexed, so finding the next measurement index
+    and querying the history stay fast no matter how many runs accumulate.
+    Appending a measurement is a single transaction.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self._create_unique_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _create_unique_index(self):
+        """Adds the unique key, first dropping duplicates left by earlier repeated imports."""
+        if self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'peaks_unique'").fetchone():
+            return
+        key = ', '.join(UNIQUE_KEY)
+        with self.conn:
+            self.conn.execute(f"DELETE FROM peaks WHERE id NOT IN (SELECT MIN(id) FROM peaks GROUP BY {key})")
+            self.conn.execute(f"CREATE UNIQUE INDEX peaks_unique ON peaks ({key})")
+
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM peaks LIMIT 1").fetchone() is None
+
+    def next_measurement_index(self):
+        """Returns the highest measurement index + 1, or 0 for an empty database."""
+        (max_index,) = self.conn.execute("SELECT MAX(measurement_index) FROM peaks").fetchone()
+        return 0 if max_index is None else max_index + 1
+
+    def add_peaks(self, rows):
+        """
+        Inserts peak rows, given as dicts keyed by PEAK_COLUMNS, in one
+        transaction. Rows already in the database are skipped. Returns the
+        number of rows added.
+        """
+        placeholders = ", ".join("?" * len(PEAK_COLUMNS))
+        with self.conn:
+            cursor = self.conn.executemany(
+                f"INSERT OR IGNORE INTO peaks ({', '.join(PEAK_COLUMNS)}) VALUES ({placeholders})",
+                ([row.get(name, '') for name in PEAK_COLUMNS] for row in rows))
+        return cursor.rowcount
+
+    def query(self, measurement_index=None, peak_type=None, note=None, min_freq=None, max_freq=None,
+              start_time=None, end_time=None):
+        """
+        Returns the matching peaks as dicts, in the order they were added.
+
+        note matches with SQL LIKE, so '%' and '_' are wildcards. Timestamps
+        are ISO 8601 strings and compare as such.
+        """
+        conditions, params = [], []
+        for clause, value in (("measurement_index = ?", measurement_index),
+                              ("peak_type = ?", peak_type),
+                              ("note LIKE ?", note),
+                              ("frequency_hz >= ?", min_freq),
+                              ("frequency_hz <= ?", max_freq),
+                              ("timestamp >= ?", start_time),
+                              ("timestamp <= ?", end_time)):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        sql = f"SELECT {', '.join(PEAK_COLUMNS)} FROM peaks"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id"
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def import_csv(self, filename):
+        """Adds the rows of a peak report CSV not already in the database. Returns the number of rows imported."""
+        rows = []
+        with open(filename, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                try:
+                    rows.append({
+                        'measurement_index': int(row['measurement_index']),
+                        'timestamp': row['timestamp'],
+                        'peak_type': row['peak_type'],
+                        'frequency_hz': float(row['frequency_hz']),
+                        'measured_power_dbm': float(row['measured_power_dbm']),
+                        'compensation_db': float(row['compensation_db']),
+                        'corrected_power_dbm': float(row['corrected_power_dbm']),
+                        'note': row.get('note') or '',
+                    })
+                except (KeyError, ValueError, TypeError):
+                    print(f"Warning: Skipping malformed row in {filename}: {row}")
+        return self.add_peaks(rows)
+
+    def export_csv(self, filename, **filters):
+        """Writes the peaks matching filters (see query) as a peak report CSV. Returns the number of rows."""
+        rows = self.query(**filters)
+        with open(filename, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=PEAK_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        return len(rows)
+
+
+def open_results_database(csv_filename='peak_report.csv'):
+    """
+    Opens the database behind a peak report CSV. A new database is seeded
+    with the rows already in the CSV, so existing history carries over.
+    """
+    db = ResultsDatabase(database_path_for(csv_filename))
+    try:
+        if db.is_empty() and os.path.exists(csv_filename):
+            count = db.import_csv(csv_filename)
+            print(f"Imported {count} peaks from {csv_filename} into {db.path}.")
+    except Exception:
+        db.close()
+        raise
+    return db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import, export and search the peak results database.")
+    parser.add_argument("--csv", default="peak_report.csv",
+                        help="peak report CSV whose database to use (default: peak_report.csv)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="add the rows of a peak report CSV")
+    import_parser.add_argument("filename")
+
+    export_parser = subparsers.add_parser("export", help="write matching peaks to a CSV file")
+    export_parser.add_argument("filename")
+    for subparser in (export_parser, subparsers.add_parser("query", help="print matching peaks")):
+        subparser.add_argument("--index", type=int, dest="measurement_index")
+        subparser.add_argument("--type", choices=("carrier", "spurious"), dest="peak_type")
+        subparser.add_argument("--note", help="SQL LIKE pattern, e.g. '%%radio%%'")
+        subparser.add_argument("--min-freq", type=float)
+        subparser.add_argument("--max-freq", type=float)
+        subparser.add_argument("--since", dest="start_time", help="ISO 8601 timestamp")
+        subparser.add_argument("--until", dest="end_time", help="ISO 8601 timestamp")
+    args = parser.parse_args()
+
+    with open_results_database(args.csv) as db:
+        if args.command == "import":
+            print(f"Imported {db.import_csv(args.filename)} peaks from {args.filename}.")
+            return
+        filters = {name: getattr(args, name) for name in
+                   ('measurement_index', 'peak_type', 'note', 'min_freq', 'max_freq', 'start_time', 'end_time')}
+        if args.command == "export":
+            print(f"Exported {db.export_csv(args.filename, **filters)} peaks to {args.filename}.")
+        else:
+            for row in db.query(**filters):
+                print(f"{row['measurement_index']:>5} {row['timestamp']} {row['peak_type']:<8} "
+                      f"{row['frequency_hz']:>14.0f} Hz {row['corrected_power_dbm']:8.2f} dBm  {row['note']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+from sweep_store import SweepStore
+from sweep_utils import write_json_atomic
+
+SESSIONS_DIR = "sessions"
+POINTS_FILE = "points.bin"
+META_FILE = "meta.json"
+FORMAT_VERSION = 1
+
+# One fixed-size little-endian record per point, in SweepStore column order.
+RECORD_DTYPE = np.dtype([(name, '<f8') for name in SweepStore.BASE_COLUMNS + SweepStore.METADATA_COLUMNS])
+
+
+def new_session_directory(root=SESSIONS_DIR):
+    """Returns an unused, timestamped session directory path under root."""
+    base = os.path.join(root, datetime.now().strftime("%Y%m%d-%H%M%S"))
+    directory = base
+    suffix = 1
+    while os.path.exists(directory):
+        directory = f"{base}-{suffix}"
+        suffix += 1
+    return directory
+
+
+def list_sessions(root=SESSIONS_DIR):
+    """Returns the session directories under root, oldest first."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(os.path.join(root, name) for name in os.listdir(root)
+                  if os.path.exists(os.path.join(root, name, META_FILE)))
+
+
+class SessionWriter:
+    """
+    Streams sweep points to a session directory: points.bin holds one
+    RECORD_DTYPE record per point and is only ever appended to, and
+    meta.json holds the sweep settings and instrument IDs.
+
+    Every append is flushed to the operating system, so the data survives
+    the program crashing. fsync is batched to once per FSYNC_INTERVAL_S,
+    which bounds what a power failure can lose. Opening an existing session
+    continues it; a partial record left by a crash is overwritten by the
+    next append. Readers ignore it until then.
+    """
+    FSYNC_INTERVAL_S = 1.0
+
+    def __init__(self, directory, metadata=None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.meta_path = os.path.join(directory, META_FILE)
+        points_path = os.path.join(directory, POINTS_FILE)
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r') as f:
+                self.metadata = json.load(f)
+        else:
+            self.metadata = {
+                'format_version': FORMAT_VERSION,
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'columns': list(RECORD_DTYPE.names),
+            }
+        self.metadata.update(metadata or {})
+        write_json_atomic(self.meta_path, self.metadata)
+
+        # A partial record left by a crash is written over rather than
+        # truncated: the file may be memory-mapped by open_session(), and
+        # Windows does not allow shrinking a mapped file.
+        if os.path.exists(points_path):
+            size = os.path.getsize(points_path)
+            self._file = open(points_path, 'r+b')
+            self._file.seek(size - size % RECORD_DTYPE.itemsize)
+        else:
+            self._file = open(points_path, 'wb')
+        self._last_sync = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def append(self, columns, start=0, stop=None):
+        """Appends rows start:stop of a dict of columns, such as SweepStore.snapshot()."""
+        frequencies = columns['frequency'][start:stop]
+        records = np.empty(len(frequencies), dtype=RECORD_DTYPE)
+        for name in RECORD_DTYPE.names:
+            records[name] = columns[name][start:stop] if name in columns else np.nan
+        self._file.write(records.tobytes())
+        self._file.flush()
+        if time.monotonic() - self._last_sync >= self.FSYNC_INTERVAL_S:
+            self.sync()
+
+    def append_point(self, frequency, power, timestamp=None, **metadata):
+        """Appends one point. Metadata columns not given, e.g. rbw, are recorded as NaN."""
+        columns = {'frequency': [frequency], 'power': [power],
+                   'timestamp': [time.time() if timestamp is None else timestamp]}
+        columns.update((name, [value]) for name, value in metadata.items())
+        self.append(columns)
+
+    def sync(self):
+        """Forces the appended points to disk."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def update_metadata(self, **values):
+        self.metadata.update(values)
+        write_json_atomic(self.meta_path, self.metadata)
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+
+def open_session(directory):
+    """
+    Opens a session for reading without loading it into memory.
+
+    Returns:
+        A (metadata, columns) tuple. columns maps each column name to a
+        read-only array backed by a memory map of points.bin, so only the
+        pages actually used are read.
+    """
+    with open(os.path.join(directory, META_FILE), 'r') as f:
+        metadata = json.load(f)
+    points_path = os.path.join(directory, POINTS_FILE)
+    num_points = os.path.getsize(points_path) // RECORD_DTYPE.itemsize if os.path.exists(points_path) else 0
+    if num_points == 0:
+        return metadata, {name: np.empty(0) for name in RECORD_DTYPE.names}
+    records = np.memmap(points_path, dtype=RECORD_DTYPE, mode='r', shape=(num_points,))
+    return metadata, {name: records[name] for name in RECORD_DTYPE.names}
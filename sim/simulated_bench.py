@@ -0,0 +1,170 @@
+import os
+import re
+import time
+from collections import deque
+
+import numpy as np
+import pyvisa
+
+PROFILE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hp_instruments.yaml")
+
+SA_ADDRESSES = {
+    'HP8563A': "GPIB0::17::INSTR",
+    'HP8593EM': "GPIB0::18::INSTR",
+}
+SG_ADDRESS = "GPIB0::19::INSTR"
+
+# HP8673B program codes are sent back to back without a separator.
+HP8673B_CODE = re.compile(r"CW\??(?:\d+HZ)?|PL-?\d+DB|RF[01]|ID\?")
+
+
+def split_on_semicolons(message):
+    return [part for part in message.split(';') if part]
+
+
+def split_hp8673b_codes(message):
+    return HP8673B_CODE.findall(message)
+
+
+class SimulatedInstrument:
+    """
+    Wraps a pyvisa-sim resource with the timing behaviour of a real GPIB
+    instrument, and counts bus transactions.
+
+    Every write, read, query and serial poll costs latency_s plus
+    per_byte_s for each byte moved. A TS command starts a sweep lasting
+    sweep_time_s: queries wait for it to finish and the status byte reports
+    end of sweep (bit value 4) once it has. Binary trace queries (TRA?/TRB?/
+    TRC? after TDF B) return a synthetic noise trace with a tone at the
+    center, since pyvisa-sim only deals in text. Queries inside a written
+    message queue their responses for the following reads, as on the bus.
+
+    The wrapper does not implement wait_for_srq, so drivers exercise their
+    status byte polling fallback.
+    """
+    END_OF_SWEEP_BIT = 4
+
+    def __init__(self, resource, latency_s=0.002, per_byte_s=2e-6, sweep_time_s=0.02,
+                 split_commands=split_on_semicolons, trace_points=401, trace_reference_units=8000,
+                 trace_units_per_division=1000):
+        self.resource = resource
+        self.resource.write_termination = '\n'
+        self.resource.read_termination = '\n'
+        self.latency_s = latency_s
+        self.per_byte_s = per_byte_s
+        self.sweep_time_s = sweep_time_s
+        self.split_commands = split_commands
+        self.trace_points = trace_points
+        self.trace_reference_units = trace_reference_units
+        self.trace_units_per_division = trace_units_per_division
+        self.timeout = resource.timeout
+        self.transactions = 0
+        self._sweep_done_at = 0.0
+        self._binary_format = False
+        self._binary_response = None
+        # SIGDEL ALL empties the signal list until the next MEASALLSIGS.
+        self._signal_list_cleared = False
+        self._responses = deque()
+        self._rng = np.random.default_rng(0)
+
+    def __getattr__(self, name):
+        return getattr(self.resource, name)
+
+    @property
+    def resource_name(self):
+        return self.resource.resource_name
+
+    def _transaction(self, num_bytes):
+        self.transactions += 1
+        time.sleep(self.latency_s + num_bytes * self.per_byte_s)
+
+    def _wait_for_sweep(self):
+        remaining = self._sweep_done_at - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def _synthetic_trace(self):
+        noise_floor = self.trace_reference_units - 7 * self.trace_units_per_division
+        trace = noise_floor + self._rng.normal(0, self.trace_units_per_division / 20, self.trace_points)
+        center = self.trace_points // 2
+        offsets = np.arange(self.trace_points) - center
+        trace += 5 * self.trace_units_per_division * np.exp(-0.5 * (offsets / 3.0) ** 2)
+        return trace.astype('>i2').tobytes()
+
+    def _forward(self, parts):
+        """Forwards the commands of one message, returning the responses to its queries."""
+        responses = []
+        for part in parts:
+            if part == "TS":
+                self._sweep_done_at = time.monotonic() + self.sweep_time_s
+            elif part.startswith("TDF "):
+                self._binary_format = part == "TDF B"
+            elif part in ("SIGDEL ALL", "MEASALLSIGS"):
+                self._signal_list_cleared = part == "SIGDEL ALL"
+
+            if part.endswith('?'):
+                self._wait_for_sweep()
+                if self._binary_format and part in ("TRA?", "TRB?", "TRC?"):
+                    self._binary_response = self._synthetic_trace()
+                elif part == "SIGLEN?" and self._signal_list_cleared:
+                    responses.append("0")
+                else:
+                    responses.append(self.resource.query(part))
+            else:
+                self.resource.write(part)
+        return responses
+
+    def write(self, message):
+        self._transaction(len(message))
+        self._responses.extend(self._forward(self.split_commands(message)))
+
+    def query(self, message):
+        responses = self._forward(self.split_commands(message))
+        response = responses[-1] if responses else None
+        self._transaction(len(message) + len(response or ""))
+        return response
+
+    def read(self):
+        self._wait_for_sweep()
+        response = self._responses.popleft() if self._responses else self.resource.read()
+        self._transaction(len(response))
+        return response
+
+    def read_bytes(self, count):
+        self._transaction(count)
+        response, self._binary_response = self._binary_response, None
+        if response is None:
+            return self.resource.read_bytes(count)
+        return response[:count]
+
+    def read_stb(self):
+        self._transaction(1)
+        return self.END_OF_SWEEP_BIT if time.monotonic() >= self._sweep_done_at else 0
+
+    def close(self):
+        self.resource.close()
+
+
+def open_simulated_bench(sa_model='HP8593EM', latency_s=0.002, per_byte_s=2e-6, sweep_time_s=0.02):
+    """
+    Opens a simulated spectrum analyzer and HP8673B signal generator.
+
+    Returns:
+        A (sa, sg) tuple of drivers. Their .instrument attributes are the
+        SimulatedInstrument wrappers, which hold the transaction counters.
+    """
+    from devices.hp8563a import HP8563A
+    from devices.hp8593em import HP8593EM
+    from devices.hp8673b import HP8673B
+
+    sa_classes = {'HP8563A': HP8563A, 'HP8593EM': HP8593EM}
+    sa_class = sa_classes[sa_model]
+
+    rm = pyvisa.ResourceManager(f"{PROFILE_FILE}@sim")
+    sa_bus = SimulatedInstrument(rm.open_resource(SA_ADDRESSES[sa_model]), latency_s, per_byte_s, sweep_time_s,
+                                 trace_points=sa_class.TRACE_POINTS,
+                                 trace_reference_units=sa_class.TRACE_REFERENCE_UNITS,
+                                 trace_units_per_division=sa_class.TRACE_UNITS_PER_DIVISION)
+    sg_bus = SimulatedInstrument(rm.open_resource(SG_ADDRESS), latency_s, per_byte_s, sweep_time_s,
+                                 split_commands=split_hp8673b_codes)
+    return sa_class(sa_bus), HP8673B(sg_bus)
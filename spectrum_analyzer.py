@@ -1,10 +1,14 @@
 from devices.hp8593em import HP8593EM
+import numpy as np
 import pyvisa as visa
 import time
 import analysis
+from compensation import load_compensation_files
 from visa_utils import discover_and_connect
 
-COMPENSATION_FILE = 'ext_att_compensation.csv'
+# Corrections for everything between the device and the analyzer. List one
+# file per part (cable, attenuator, antenna factor); their values add up.
+COMPENSATION_FILES = ['ext_att_compensation.csv']
 
 def get_carrier_frequency():
     """Prompts user for carrier frequency and parses it."""
@@ -20,26 +24,23 @@ def get_carrier_frequency():
         except (ValueError, IndexError):
             print("Invalid input. Please enter a valid frequency (e.g., '100mhz', '2.4g').")
 
-def print_peak_details(freq, power, comp_freqs, comp_dbs):
+def print_peak_details(freq, power, compensation_db):
     """Prints the details of a single signal peak, including compensation."""
-    compensation_db = analysis.get_compensation(freq, comp_freqs, comp_dbs)
     corrected_power = power - compensation_db
     print(f"  Frequency: {analysis.format_frequency(freq)}, Measured Power: {power:.2f} dBm")
     if compensation_db != 0.0:
         print(f"  Compensation: {compensation_db:.2f} dB")
         print(f"  Corrected Power: {corrected_power:.2f} dBm = {analysis.dbm_to_watts_formatted(corrected_power)}")
 
-def print_peak_report(carrier_peaks, spurious_peaks, comp_freqs, comp_dbs):
+def print_peak_report(carrier_peaks, spurious_peaks, compensation):
     """Prints a formatted report of carrier and spurious peaks."""
-    if carrier_peaks:
-        print("\n--- Carrier Signal Detected ---")
-        for freq, power in carrier_peaks:
-            print_peak_details(freq, power, comp_freqs, comp_dbs)
-
-    if spurious_peaks:
-        print("\n--- Spurious Emissions Detected ---")
-        for freq, power in spurious_peaks:
-            print_peak_details(freq, power, comp_freqs, comp_dbs)
+    for title, peaks in (("Carrier Signal Detected", carrier_peaks), ("Spurious Emissions Detected", spurious_peaks)):
+        if not peaks:
+            continue
+        print(f"\n--- {title} ---")
+        comp_dbs = analysis.get_compensation(np.array([freq for freq, _ in peaks], dtype=float), compensation)
+        for (freq, power), compensation_db in zip(peaks, comp_dbs):
+            print_peak_details(freq, power, compensation_db)
     
     if not spurious_peaks and carrier_peaks:
         print("\nNo significant spurious emissions found.")
@@ -48,7 +49,7 @@ def print_peak_report(carrier_peaks, spurious_peaks, comp_freqs, comp_dbs):
 
 def main():
     """Main execution function."""
-    comp_freqs, comp_dbs = analysis.load_compensation_file(COMPENSATION_FILE)
+    compensation = load_compensation_files(COMPENSATION_FILES)
     sa = None
 
     try:
@@ -75,10 +76,10 @@ def main():
             return
             
         carrier_peaks, spurious_peaks = analysis.separate_carrier_and_spurious(peaks, carrier_freq)
-        print_peak_report(carrier_peaks, spurious_peaks, comp_freqs, comp_dbs)
+        print_peak_report(carrier_peaks, spurious_peaks, compensation)
         
         note = input("Enter a note for this measurement: ")
-        analysis.append_peaks_to_csv(carrier_peaks, spurious_peaks, comp_freqs, comp_dbs, note)
+        analysis.append_peaks_to_csv(carrier_peaks, spurious_peaks, compensation, note)
 
     except (visa.errors.VisaIOError, ConnectionError) as e:
         print(f"Error communicating with instrument: {e}")
@@ -1,12 +1,14 @@
 import csv
+import logging
 import time
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pyvisa
 from devices.hp8593em import HP8593EM
 from devices.hp8673b import HP8673B
 from sweep_utils import halton, parse_frequency, run_sweep
+from log_setup import enable_console_logging
+from session_store import SessionWriter, new_session_directory
 from visa_utils import discover_and_connect
 
 
@@ -14,17 +16,13 @@ def main():
     """
     Main function to run the sweep analysis.
     """
+    # Show the per-point progress that run_sweep logs at DEBUG level.
+    enable_console_logging(logging.DEBUG)
     sa = None
     sg = None
+    session = None
     results = []
-    
-    # Setup plot
-    plt.ion()
-    fig, ax = plt.subplots()
-    line, = ax.plot([], [], 'o-')
-    ax.set_xlabel("Frequency (MHz)")
-    ax.set_ylabel("Power (dBm)")
-    ax.grid()
+    plt = None
 
     try:
         device_map = {
@@ -43,7 +41,14 @@ def main():
         start_freq = parse_frequency(start_freq_str)
         end_freq = parse_frequency(end_freq_str)
         
-        # Set plot limits based on frequency range
+        # matplotlib is slow to import, so load it only once there is something to plot.
+        import matplotlib.pyplot as plt
+        plt.ion()
+        fig, ax = plt.subplots()
+        line, = ax.plot([], [], 'o-')
+        ax.set_xlabel("Frequency (MHz)")
+        ax.set_ylabel("Power (dBm)")
+        ax.grid()
         ax.set_xlim(start_freq / 1e6, end_freq / 1e6)
         
         if points_str:
@@ -59,10 +64,17 @@ def main():
 
 
         # Setup devices
-        sg.set_power(0)
-        sg.enable_rf(True)
+        with sg.batch():
+            sg.set_power(0)
+            sg.enable_rf(True)
         sa.set_zero_span()
 
+        # Stream every point to a session on disk, so nothing is lost if the
+        # script is interrupted before the CSV is saved.
+        session = SessionWriter(new_session_directory(), {'sa_id': sa.get_id().strip(), 'sg_id': sg.get_id().strip(),
+                                                          'start_freq': start_freq, 'end_freq': end_freq})
+        print(f"Recording session to {session.directory}")
+
         # Sweep
         measured_freqs = []
         measured_powers = []
@@ -71,6 +83,7 @@ def main():
 
         for freq, power in sweep_generator:
             results.append((freq, power))
+            session.append_point(freq, power, sg_power=0)
             
             # Update plot
             measured_freqs.append(freq / 1e6)
@@ -88,6 +101,8 @@ def main():
     except ValueError:
         print("Invalid frequency or number of points.")
     finally:
+        if session:
+            session.close()
         if sa:
             sa.close()
         if sg:
@@ -131,9 +146,10 @@ def main():
                 fig.savefig(png_filename)
                 print(f"Plot saved to {png_filename}")
 
-        plt.ioff()
-        print("Script finished. Close the plot window to exit.")
-        plt.show()
+        if plt is not None:
+            plt.ioff()
+            print("Script finished. Close the plot window to exit.")
+            plt.show()
 
 if __name__ == "__main__":
     main()
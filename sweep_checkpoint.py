@@ -0,0 +1,69 @@
+import json
+import os
+import time
+
+import numpy as np
+from sweep_utils import write_json_atomic
+
+CHECKPOINT_FILE = "sweep_checkpoint.json"
+
+class SweepCheckpoint:
+    """
+    Progress of a finite sweep: its configuration, its full frequency grid,
+    which grid points have been measured, and the session directory holding
+    those measurements.
+
+    Points are marked done once they are recorded in the session, so a
+    point counted as done is never missing from it. The file is written
+    atomically, at most once per SAVE_INTERVAL_S while the sweep runs and
+    once more when it stops, so an interrupted sweep can be resumed by
+    measuring only the remaining frequencies.
+    """
+    SAVE_INTERVAL_S = 1.0
+
+    def __init__(self, config, frequencies, completed=(), session_directory=None, filepath=CHECKPOINT_FILE):
+        self.config = config
+        self.frequencies = [float(f) for f in frequencies]
+        self.completed = set(completed)
+        self.session_directory = session_directory
+        self.filepath = filepath
+        self._index = {freq: i for i, freq in enumerate(self.frequencies)}
+        self._last_save = 0.0
+
+    @classmethod
+    def load(cls, filepath=CHECKPOINT_FILE):
+        """Returns the saved checkpoint, or None if there is none."""
+        if not os.path.exists(filepath):
+            return None
+        with open(filepath, 'r') as f:
+            data = json.load(f)
+        return cls(data['config'], data['frequencies'], data['completed'], data.get('session_directory'), filepath)
+
+    def mark_done(self, frequencies):
+        """Records measured grid frequencies, saving if SAVE_INTERVAL_S has passed. Others are ignored."""
+        for freq in frequencies:
+            i = self._index.get(float(freq))
+            if i is not None:
+                self.completed.add(i)
+        if time.monotonic() - self._last_save >= self.SAVE_INTERVAL_S:
+            self.save()
+
+    def remaining(self):
+        """Returns the grid frequencies not measured yet, in sweep order."""
+        return np.array([freq for i, freq in enumerate(self.frequencies) if i not in self.completed])
+
+    def is_complete(self):
+        return len(self.completed) == len(self.frequencies)
+
+    def save(self):
+        write_json_atomic(self.filepath, {
+            'config': self.config,
+            'frequencies': self.frequencies,
+            'completed': sorted(self.completed),
+            'session_directory': self.session_directory,
+        })
+        self._last_save = time.monotonic()
+
+    def delete(self):
+        if os.path.exists(self.filepath):
+            os.remove(self.filepath)
@@ -1,77 +1,65 @@
 from PyQt5.QtCore import QObject, pyqtSignal, QThread
 from sweep_utils import parse_frequency
-import numpy as np
-from sweep_worker import SweepWorker
+from sweep_planner import SweepPlanner
+from sweep_worker import SweepWorker, CalibrationWorker
 
 class SweepController(QObject):
+    """Runs the sweeps planned by a SweepPlanner on a QThread, feeding the results to the SweepModel."""
+    # Results reach the model in chunks at most this far apart.
+    RESULT_CHUNK_INTERVAL_S = 0.1
+
     log = pyqtSignal(str)
     sweep_status_changed = pyqtSignal(bool, str) # is_running, sweep_type
+    offset_calibrated = pyqtSignal(int)
 
     def __init__(self, device_manager, sweep_model, parent=None):
         super().__init__(parent)
         self.device_manager = device_manager
         self.sweep_model = sweep_model
+        self.planner = SweepPlanner(sweep_model.data, log_callback=self.log.emit)
         self.sweep_thread = None
         self.sweep_worker = None
 
-    def start_sweep(self, sweep_type, sweep_config):
+    def _can_start(self, action):
+        """Cancels a running sweep instead, or logs why no sweep can start. Returns True if one can."""
         if self.sweep_thread and self.sweep_thread.isRunning():
             self.cancel_sweep()
-            return
+            return False
 
         if not self.device_manager.connected:
-            self.log.emit("Cannot start sweep: Devices are not connected.")
-            return
+            self.log.emit(f"Cannot {action}: Devices are not connected.")
+            return False
+        return True
 
-        try:
-            start_freq = parse_frequency(sweep_config["start_freq"])
-            stop_freq = parse_frequency(sweep_config["stop_freq"])
-            
-            if sweep_type == 'run_sweep':
-                self.log.emit("Running sweep with current settings.")
-                num_points = int(sweep_config["points"])
-                frequencies = np.linspace(start_freq, stop_freq, num_points)
-                self._start_sweep_thread(frequencies, 'finite', sweep_config, start_freq=start_freq, stop_freq=stop_freq)
-            
-            elif sweep_type == 'continuous_interpolation':
-                self.log.emit("Starting continuous interpolation sweep.")
-                self._start_sweep_thread([], 'continuous', sweep_config, initial_data=self.sweep_model.get_sweep_data(), 
-                                         start_freq=start_freq, stop_freq=stop_freq)
+    def start_sweep(self, sweep_type, sweep_config):
+        if self._can_start("start sweep"):
+            self._start_sweep_thread(self.planner.plan(sweep_type, sweep_config, sa_id=self.device_manager.sa_id,
+                                                       sg_id=self.device_manager.sg_id),
+                                     sweep_config.get("active_button"))
 
-        except Exception as e:
-            self.log.emit(f"Invalid sweep parameter: {e}")
+    def resume_sweep(self, active_button='resume_sweep'):
+        """Measures the points an interrupted finite sweep did not reach, adding them to its session."""
+        if self._can_start("resume sweep"):
+            self._start_sweep_thread(self.planner.plan_resume(active_button, sa_id=self.device_manager.sa_id,
+                                                              sg_id=self.device_manager.sg_id),
+                                     active_button)
 
-    def _start_sweep_thread(self, frequencies, mode, sweep_config, initial_data=None, start_freq=None, stop_freq=None):
-        
-        try:
-            rbw = parse_frequency(sweep_config["rbw"])
-            power = sweep_config["power"]
-            sg_tracking_disabled = sweep_config["sg_tracking_disabled"]
-            sa_freq_offset = int(sweep_config["sa_freq_offset"])
-        except Exception as e:
-            self.log.emit(f"Invalid sweep parameter: {e}")
+    def _start_sweep_thread(self, engine_args, active_button):
+        if engine_args is None:
             return
+        sweep_worker = SweepWorker(self.device_manager.sa, self.device_manager.sg,
+                                   chunk_interval_s=self.RESULT_CHUNK_INTERVAL_S, **engine_args)
+        sweep_worker.chunk.connect(self.sweep_model.add_data_chunk)
+        self._start_worker_thread(sweep_worker, active_button)
 
-        self.sweep_status_changed.emit(True, sweep_config.get("active_button"))
+    def _start_worker_thread(self, worker, active_button):
+        self.sweep_status_changed.emit(True, active_button)
         self.sweep_thread = QThread()
-        self.sweep_worker = SweepWorker(
-            sa=self.device_manager.sa,
-            sg=self.device_manager.sg,
-            frequencies=frequencies,
-            sg_tracking_disabled=sg_tracking_disabled,
-            sa_freq_offset=sa_freq_offset,
-            power=power,
-            rbw=rbw,
-            mode=mode,
-            initial_data=initial_data,
-            start_freq=start_freq,
-            stop_freq=stop_freq
-        )
+        self.sweep_worker = worker
         self.sweep_worker.moveToThread(self.sweep_thread)
 
         self.sweep_thread.started.connect(self.sweep_worker.run)
         self.sweep_worker.finished.connect(self.on_sweep_finished)
-        self.sweep_worker.progress.connect(self.sweep_model.add_data_point)
         self.sweep_worker.error.connect(self.log.emit)
         self.sweep_worker.log.connect(self.log.emit)
         
@@ -82,12 +70,48 @@ class SweepController(QObject):
 
         self.sweep_thread.start()
 
+    def calibrate_offset(self, sweep_config):
+        """
+        Measures the SA/SG frequency offset with one narrow sweep around the
+        manual SG frequency, or the middle of the sweep range if none is set.
+        """
+        if self.sweep_thread and self.sweep_thread.isRunning():
+            self.log.emit("Cannot calibrate while a sweep is running.")
+            return
+
+        if not self.device_manager.connected:
+            self.log.emit("Cannot calibrate: Devices are not connected.")
+            return
+
+        try:
+            if sweep_config.get("sg_manual_freq"):
+                freq = parse_frequency(sweep_config["sg_manual_freq"])
+            else:
+                start_freq = parse_frequency(sweep_config["start_freq"])
+                stop_freq = parse_frequency(sweep_config["stop_freq"])
+                freq = (start_freq + stop_freq) / 2
+            power = sweep_config["power"]
+        except Exception as e:
+            self.log.emit(f"Invalid calibration parameter: {e}")
+            return
+
+        calibration_worker = CalibrationWorker(
+            sa=self.device_manager.sa,
+            sg=self.device_manager.sg,
+            freq=freq,
+            power=power
+        )
+        calibration_worker.result.connect(self.offset_calibrated.emit)
+        self._start_worker_thread(calibration_worker, sweep_config.get("active_button"))
+
     def cancel_sweep(self):
         self.log.emit("Attempting to cancel sweep...")
-        if self.sweep_worker:
+        if self.sweep_worker and hasattr(self.sweep_worker, 'stop'):
             self.sweep_worker.stop()
 
     def on_sweep_finished(self):
+        # Every result chunk has been recorded by now, as they were emitted before finished.
+        self.sweep_model.data.finish_checkpoint()
         self.log.emit("Sweep has finished or was cancelled.")
         self.sweep_status_changed.emit(False, "")
     
@@ -0,0 +1,118 @@
+from session_store import SessionWriter, new_session_directory, open_session
+from sweep_store import SweepStore
+
+class SweepData:
+    """
+    The sweep results: a SweepStore whose points are also streamed to a
+    session directory on disk, and the checkpoint of the finite sweep being
+    recorded, if any. It does not depend on Qt; SweepModel wraps it for the
+    GUI.
+
+    The session starts with the first point after the data is cleared.
+    Checkpoint points are marked done only once they are in the session.
+    change_callback() is called whenever points are added, loaded or
+    cleared.
+    """
+    def __init__(self, log_callback=print, change_callback=None):
+        self.store = SweepStore()
+        self.log_callback = log_callback
+        self.change_callback = change_callback
+        self.session = None
+        self.session_directory = None
+        self.session_metadata = {}
+        # SweepCheckpoint of the finite sweep being recorded, if any.
+        self.checkpoint = None
+
+    def set_sweep_metadata(self, rbw=None, sg_power=None, sa_freq_offset=None):
+        """Sets the settings recorded with the points added from now on."""
+        self.store.set_metadata(rbw=rbw, sg_power=sg_power, sa_freq_offset=sa_freq_offset)
+
+    def set_session_metadata(self, **values):
+        """Records sweep settings and instrument IDs in the session's meta.json."""
+        self.session_metadata.update(values)
+        if self.session:
+            self.session.update_metadata(**values)
+
+    def add_points(self, freqs, powers, timestamps=None):
+        """Appends a block of points and records them to the session. Timestamps default to now."""
+        start = len(self.store)
+        self.store.extend(freqs, powers, timestamps=timestamps)
+        self._record_to_session(start)
+        self._changed()
+
+    def _changed(self):
+        if self.change_callback:
+            self.change_callback()
+
+    def ensure_session_directory(self):
+        """Returns the directory the current data is recorded to, choosing one if needed."""
+        if self.session_directory is None:
+            self.session_directory = new_session_directory()
+        return self.session_directory
+
+    def _record_to_session(self, start):
+        """Appends the points from index start onwards to the session file."""
+        try:
+            if self.session is None:
+                self.session = SessionWriter(self.ensure_session_directory(), self.session_metadata)
+                self.log_callback(f"Recording session to {self.session_directory}")
+            self.session.append(self.store.snapshot(start))
+        except OSError as e:
+            self.log_callback(f"Error writing session file: {e}")
+            return
+        if self.checkpoint is not None:
+            self.checkpoint.mark_done(self.store.column('frequency', start))
+
+    def set_checkpoint(self, checkpoint):
+        """Marks the points of a finite sweep done in checkpoint as they are recorded to the session."""
+        self.checkpoint = checkpoint
+
+    def finish_checkpoint(self):
+        """Saves the checkpoint once its sweep has stopped, deleting it if every point was recorded."""
+        checkpoint, self.checkpoint = self.checkpoint, None
+        if checkpoint is None:
+            return
+        try:
+            if checkpoint.is_complete():
+                checkpoint.delete()
+            else:
+                checkpoint.save()
+                self.log_callback(f"Sweep incomplete: {len(checkpoint.remaining())} points remain. "
+                                  f"Use Resume Sweep to measure them.")
+        except OSError as e:
+            self.log_callback(f"Error saving sweep checkpoint: {e}")
+
+    def close_session(self):
+        if self.session:
+            self.session.close()
+            self.session = None
+
+    def load_session(self, directory):
+        """
+        Makes a saved session the current data. The points are memory-mapped
+        rather than read, and stay that way; new points are appended to the
+        same session. Returns False if it could not be opened.
+        """
+        try:
+            metadata, columns = open_session(directory)
+        except (OSError, ValueError) as e:
+            self.log_callback(f"Error opening session: {e}")
+            return False
+        self.close_session()
+        self.store.load_columns(columns)
+        self.session_directory = directory
+        self.session_metadata = metadata
+        self.log_callback(f"Opened session {directory} with {len(self.store)} points.")
+        self._changed()
+        return True
+
+    def clear(self):
+        self.close_session()
+        self.session_directory = None
+        self.session_metadata = {}
+        self.store.clear()
+        self._changed()
+
+    def snapshot(self, start=0):
+        """Returns read-only NumPy views of the sweep columns from row start onwards, see SweepStore.snapshot."""
+        return self.store.snapshot(start)
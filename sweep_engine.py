@@ -0,0 +1,165 @@
+import logging
+from sweep_refinement import GapIndex, AdaptiveRefiner
+from sweep_store import ChunkBuffer
+from sweep_utils import run_sweep, measure_point
+
+logger = logging.getLogger(__name__)
+
+class SweepEngine:
+    """
+    Runs a finite, continuous or adaptive sweep. It does not depend on Qt,
+    so scripts can drive it directly; SweepWorker wraps it for the GUI.
+
+    Results go to result_callback(freq, power) one point at a time, or to
+    chunk_callback(freqs, powers, timestamps) in NumPy chunks when
+    chunk_interval_s is set. stop() may be called from another thread.
+    """
+    # In adaptive mode, flat regions are refined until the range is split
+    # into at least this many intervals.
+    ADAPTIVE_MIN_INTERVALS = 16
+
+    def __init__(self, sa, sg, frequencies, sg_tracking_disabled, sa_freq_offset, power, rbw,
+                 mode='finite', initial_data=None, start_freq=None, stop_freq=None, power_mode='marker',
+                 settle_tolerance_db=None, adaptive_tolerance_db=1.0, chunk_interval_s=None,
+                 result_callback=None, chunk_callback=None, log_callback=print):
+        self.sa = sa
+        self.sg = sg
+        self.frequencies = frequencies
+        self.sg_tracking_disabled = sg_tracking_disabled
+        self.sa_freq_offset = sa_freq_offset
+        self.power = power
+        self.rbw = rbw
+        self.mode = mode
+        self.start_freq = start_freq
+        self.stop_freq = stop_freq
+        self.power_mode = power_mode
+        self.settle_tolerance_db = settle_tolerance_db
+        self.adaptive_tolerance_db = adaptive_tolerance_db
+        self.result_callback = result_callback
+        self.chunk_callback = chunk_callback
+        self.log_callback = log_callback
+        # initial_data is a snapshot of previously measured columns.
+        if mode == 'adaptive':
+            self.point_index = self._create_refiner(initial_data)
+        else:
+            self.point_index = GapIndex(initial_data['frequency'] if initial_data is not None else ())
+        self.chunk_buffer = ChunkBuffer(max_interval_s=chunk_interval_s) if chunk_interval_s is not None else None
+        self._is_cancelled = False
+
+    def _emit_result(self, freq, power):
+        if self.chunk_buffer is None:
+            if self.result_callback:
+                self.result_callback(freq, power)
+            return
+        chunk = self.chunk_buffer.add(freq, power)
+        if chunk is not None and self.chunk_callback:
+            self.chunk_callback(*chunk)
+
+    def _flush_results(self):
+        if self.chunk_buffer is not None:
+            chunk = self.chunk_buffer.flush()
+            if chunk is not None and self.chunk_callback:
+                self.chunk_callback(*chunk)
+
+    def _create_refiner(self, initial_data):
+        """Builds the adaptive refiner from the previously measured points inside the sweep range."""
+        freqs, powers = (), ()
+        if initial_data is not None:
+            in_range = (initial_data['frequency'] >= self.start_freq) & (initial_data['frequency'] <= self.stop_freq)
+            freqs, powers = initial_data['frequency'][in_range], initial_data['power'][in_range]
+        # Points closer together than the RBW are not independent readings.
+        return AdaptiveRefiner(self.adaptive_tolerance_db,
+                               max_gap_hz=(self.stop_freq - self.start_freq) / self.ADAPTIVE_MIN_INTERVALS,
+                               min_gap_hz=self.rbw, frequencies=freqs, powers=powers)
+
+    def run(self):
+        """
+        Runs the sweep until it completes or stop() is called. Buffered
+        results are delivered and RF is turned off even if it fails.
+        """
+        try:
+            self.log_callback("Configuring devices for sweep...")
+            with self.sa.batch():
+                self.sa.set_single_sweep_mode()
+                self.sa.set_resolution_bandwidth(self.rbw)
+                self.sa.set_zero_span()
+            with self.sg.batch():
+                self.sg.set_power(self.power)
+                self.sg.enable_rf(True)
+
+            if self.mode == 'finite':
+                self._run_finite()
+            elif self.mode in ('continuous', 'adaptive'):
+                self._run_refinement()
+        finally:
+            self._flush_results()
+            if self.sg:
+                self.sg.enable_rf(False)
+            self.log_callback("Sweep finished.")
+
+    def _run_finite(self):
+        sweep_generator = run_sweep(self.sa, self.sg, self.frequencies,
+                                    sg_tracking_disabled=self.sg_tracking_disabled,
+                                    sa_freq_offset=self.sa_freq_offset,
+                                    log_callback=self.log_callback,
+                                    power_mode=self.power_mode,
+                                    settle_tolerance_db=self.settle_tolerance_db)
+        for freq, power in sweep_generator:
+            if self._is_cancelled:
+                self.log_callback("Sweep cancellation requested.")
+                break
+            self._emit_result(freq, power)
+
+    def _run_refinement(self):
+        sweep_timeout_s = self.sa.get_sweep_timeout()
+
+        def _measure_point(freq):
+            """Helper to measure power at a single frequency."""
+            logger.debug("Measuring at: %s Hz", freq)
+            return measure_point(self.sa, self.sg, freq, self.sg_tracking_disabled,
+                                 self.sa_freq_offset, self.power_mode, self.log_callback,
+                                 settle_tolerance_db=self.settle_tolerance_db,
+                                 sweep_timeout_s=sweep_timeout_s)
+
+        def _add_data_point(freq, power):
+            """Helper to add a data point to the point index and emit progress."""
+            if self.mode == 'adaptive':
+                self.point_index.add(freq, power)
+            else:
+                self.point_index.add(freq)
+            self._emit_result(freq, power)
+
+        # Ensure start and stop frequencies are included before interpolating
+        for freq_endpoint in [self.start_freq, self.stop_freq]:
+            if freq_endpoint not in self.point_index:
+                if self._is_cancelled: break
+                power = _measure_point(freq_endpoint)
+                _add_data_point(freq_endpoint, power)
+
+        while self.mode == 'adaptive' and not self._is_cancelled:
+            next_freq = self.point_index.next_frequency()
+            if next_freq is None:
+                self.log_callback(f"Adaptive sweep converged to {self.adaptive_tolerance_db} dB "
+                                  f"with {len(self.point_index)} points. Stopping.")
+                break
+
+            power = _measure_point(next_freq)
+            _add_data_point(next_freq, power)
+
+        while self.mode == 'continuous' and not self._is_cancelled:
+            if len(self.point_index) < 2:
+                self.log_callback("Not enough data to interpolate. Stopping continuous mode.")
+                break
+
+            start_gap, end_gap = self.point_index.largest_gap()
+            next_freq = int(round(start_gap + (end_gap - start_gap) / 2))
+
+            if next_freq <= start_gap or next_freq >= end_gap:
+                self.log_callback("No new measurable points to add. Smallest gap reached. Stopping.")
+                break
+
+            power = _measure_point(next_freq)
+            _add_data_point(next_freq, power)
+
+    def stop(self):
+        self._is_cancelled = True
@@ -1,33 +1,53 @@
-import pandas as pd
 import json
 import os
 from PyQt5.QtCore import QObject, pyqtSignal
+from sweep_data import SweepData
 
 class SweepModel(QObject):
+    """Wraps SweepData for the GUI, announcing every change with data_changed."""
     data_changed = pyqtSignal()
     log = pyqtSignal(str)
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.sweep_data = pd.DataFrame(columns=['frequency', 'power'])
+        self.data = SweepData(log_callback=self.log.emit, change_callback=self.data_changed.emit)
         self.config = {}
         self.config_file = "config.json"
 
+    @property
+    def store(self):
+        return self.data.store
+
+    def set_sweep_metadata(self, rbw=None, sg_power=None, sa_freq_offset=None):
+        self.data.set_sweep_metadata(rbw=rbw, sg_power=sg_power, sa_freq_offset=sa_freq_offset)
+
+    def set_session_metadata(self, **values):
+        self.data.set_session_metadata(**values)
+
     def add_data_point(self, freq, power):
-        new_data = pd.DataFrame([{'frequency': freq, 'power': power}])
-        if self.sweep_data.empty:
-            self.sweep_data = new_data
-        else:
-            self.sweep_data = pd.concat([self.sweep_data, new_data], ignore_index=True)
-        self.data_changed.emit()
+        self.data.add_points([freq], [power])
+
+    def add_data_chunk(self, freqs, powers, timestamps=None):
+        """Appends a block of points with a single change notification. Timestamps default to now."""
+        self.data.add_points(freqs, powers, timestamps)
+
+    def close_session(self):
+        self.data.close_session()
+
+    def load_session(self, directory):
+        self.data.load_session(directory)
 
     def clear_data(self):
-        self.sweep_data = pd.DataFrame(columns=['frequency', 'power'])
+        self.data.clear()
         self.log.emit("Sweep data cleared.")
-        self.data_changed.emit()
+
+    def get_snapshot(self, start=0):
+        """Returns read-only NumPy views of the sweep columns from row start onwards, see SweepStore.snapshot."""
+        return self.data.snapshot(start)
 
     def get_sweep_data(self):
-        return self.sweep_data.copy()
+        """Returns a copy of the sweep data as a DataFrame."""
+        return self.store.to_dataframe()
 
     def save_config(self, config):
         self.config = config
@@ -42,7 +62,7 @@ class SweepModel(QObject):
         if not os.path.exists(self.config_file):
             self.log.emit("No config file found.")
             return {}
-        
+
         try:
             with open(self.config_file, 'r') as f:
                 self.config = json.load(f)
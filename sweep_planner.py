@@ -0,0 +1,118 @@
+import os
+import numpy as np
+from sweep_checkpoint import SweepCheckpoint
+from sweep_utils import parse_frequency
+
+def parse_sweep_settings(sweep_config):
+    """
+    Reads the instrument settings of a sweep from its GUI config.
+
+    Returns:
+        A dict of SweepEngine keyword arguments.
+
+    Raises:
+        KeyError or ValueError if a setting is missing or invalid.
+    """
+    settle_tolerance = sweep_config.get("settle_tolerance_db", "")
+    return {
+        'rbw': parse_frequency(sweep_config["rbw"]),
+        'power': float(sweep_config["power"]),
+        'sg_tracking_disabled': sweep_config["sg_tracking_disabled"],
+        'sa_freq_offset': int(sweep_config["sa_freq_offset"]),
+        'power_mode': sweep_config.get("power_mode", "marker"),
+        'settle_tolerance_db': float(settle_tolerance) if settle_tolerance else None,
+        'adaptive_tolerance_db': float(sweep_config.get("adaptive_tolerance_db") or 1.0),
+    }
+
+class SweepPlanner:
+    """
+    Turns sweep settings into SweepEngine arguments and prepares a
+    SweepData for the sweep: the frequency grid and checkpoint of a finite
+    sweep, the points a continuous or adaptive sweep refines, and the
+    session of an interrupted sweep to resume. It does not depend on Qt;
+    SweepController runs the planned sweeps on a worker thread.
+
+    plan() and plan_resume() return the keyword arguments for SweepEngine
+    (or SweepWorker), or None after logging why the sweep cannot start.
+    """
+    def __init__(self, data, log_callback=print):
+        self.data = data
+        self.log_callback = log_callback
+
+    def plan(self, sweep_type, sweep_config, **session_metadata):
+        """
+        Plans a 'run_sweep', 'continuous_interpolation' or 'adaptive_sweep'.
+        session_metadata, e.g. instrument IDs, is recorded in the session.
+        """
+        try:
+            start_freq = parse_frequency(sweep_config["start_freq"])
+            stop_freq = parse_frequency(sweep_config["stop_freq"])
+            settings = parse_sweep_settings(sweep_config)
+
+            if sweep_type == 'run_sweep':
+                self.log_callback("Running sweep with current settings.")
+                num_points = int(sweep_config["points"])
+                frequencies = np.linspace(start_freq, stop_freq, num_points)
+                checkpoint = SweepCheckpoint(sweep_config, frequencies,
+                                             session_directory=self.data.ensure_session_directory())
+                checkpoint.save()
+                return self._prepare(frequencies, 'finite', settings, sweep_config, session_metadata,
+                                     start_freq=start_freq, stop_freq=stop_freq, checkpoint=checkpoint)
+
+            elif sweep_type == 'continuous_interpolation':
+                self.log_callback("Starting continuous interpolation sweep.")
+                return self._prepare([], 'continuous', settings, sweep_config, session_metadata,
+                                     initial_data=self.data.snapshot(), start_freq=start_freq, stop_freq=stop_freq)
+
+            elif sweep_type == 'adaptive_sweep':
+                self.log_callback("Starting adaptive sweep.")
+                return self._prepare([], 'adaptive', settings, sweep_config, session_metadata,
+                                     initial_data=self.data.snapshot(), start_freq=start_freq, stop_freq=stop_freq)
+
+        except Exception as e:
+            self.log_callback(f"Invalid sweep parameter: {e}")
+        return None
+
+    def plan_resume(self, active_button='resume_sweep', **session_metadata):
+        """Plans measuring the points an interrupted finite sweep did not reach, adding them to its session."""
+        try:
+            checkpoint = SweepCheckpoint.load()
+        except (OSError, ValueError, KeyError) as e:
+            self.log_callback(f"Error reading sweep checkpoint: {e}")
+            return None
+        if checkpoint is None:
+            self.log_callback("No interrupted sweep to resume.")
+            return None
+
+        try:
+            settings = parse_sweep_settings(checkpoint.config)
+        except Exception as e:
+            self.log_callback(f"Invalid sweep parameter in checkpoint: {e}")
+            return None
+
+        remaining = checkpoint.remaining()
+        if len(remaining) == 0:
+            self.log_callback("The last sweep already completed.")
+            checkpoint.delete()
+            return None
+
+        # Merge with the points captured before the interruption.
+        if checkpoint.session_directory != self.data.session_directory:
+            if checkpoint.session_directory and os.path.isdir(checkpoint.session_directory):
+                self.data.load_session(checkpoint.session_directory)
+            else:
+                checkpoint.session_directory = self.data.ensure_session_directory()
+
+        self.log_callback(f"Resuming sweep: {len(remaining)} of {len(checkpoint.frequencies)} points remain.")
+        sweep_config = dict(checkpoint.config, active_button=active_button)
+        return self._prepare(remaining, 'finite', settings, sweep_config, session_metadata, checkpoint=checkpoint)
+
+    def _prepare(self, frequencies, mode, settings, sweep_config, session_metadata, initial_data=None,
+                 start_freq=None, stop_freq=None, checkpoint=None):
+        """Records the sweep's settings in the data and returns the SweepEngine arguments."""
+        self.data.set_checkpoint(checkpoint)
+        self.data.set_sweep_metadata(rbw=settings['rbw'], sg_power=settings['power'],
+                                     sa_freq_offset=settings['sa_freq_offset'])
+        self.data.set_session_metadata(**session_metadata, sweep_config=sweep_config)
+        return dict(settings, frequencies=frequencies, mode=mode, initial_data=initial_data,
+                    start_freq=start_freq, stop_freq=stop_freq)
@@ -0,0 +1,158 @@
+import bisect
+import heapq
+import numpy as np
+
+class GapIndex:
+    """
+    Index of measured frequencies that finds the largest gap between
+    neighbouring points, for continuous interpolation.
+
+    Frequencies are kept in a set for membership tests and in a sorted list
+    for finding neighbours; gaps are kept in a max-heap. Adding a point
+    pushes the two gaps it creates and leaves the gap it split in the heap,
+    where it is discarded when it reaches the top and its ends are no longer
+    neighbours. Looking up and adding points take O(log n) comparisons.
+    """
+    def __init__(self, frequencies=()):
+        self._sorted = [float(f) for f in np.unique(np.asarray(frequencies, dtype=float))]
+        self._members = set(self._sorted)
+        self._heap = [(-(end - start), start, end) for start, end in zip(self._sorted, self._sorted[1:])]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def __contains__(self, freq):
+        return float(freq) in self._members
+
+    def add(self, freq):
+        """Adds a frequency. Returns False if it was already present."""
+        freq = float(freq)
+        if freq in self._members:
+            return False
+        i = bisect.bisect_left(self._sorted, freq)
+        if i > 0:
+            self._push_gap(self._sorted[i - 1], freq)
+        if i < len(self._sorted):
+            self._push_gap(freq, self._sorted[i])
+        self._sorted.insert(i, freq)
+        self._members.add(freq)
+        return True
+
+    def _push_gap(self, start, end):
+        heapq.heappush(self._heap, (-(end - start), start, end))
+
+    def _is_gap(self, start, end):
+        i = bisect.bisect_left(self._sorted, start)
+        return i + 1 < len(self._sorted) and self._sorted[i + 1] == end
+
+    def largest_gap(self):
+        """Returns the (start, end) of the widest gap between neighbours, or None with fewer than two points."""
+        while self._heap:
+            _, start, end = self._heap[0]
+            if self._is_gap(start, end):
+                return start, end
+            heapq.heappop(self._heap)
+        return None
+
+class AdaptiveRefiner:
+    """
+    Chooses the next frequency of an adaptive sweep from the points measured
+    so far.
+
+    Each interval between neighbouring points is scored by
+
+        error + tolerance_db * width / max_gap_hz
+
+    where error is the larger deviation of its two end points from the
+    straight line through their own neighbours, i.e. how badly linear
+    interpolation would have predicted them. Curved regions such as filter
+    skirts and resonances score high and get refined; flat regions are only
+    refined until their intervals are narrower than max_gap_hz, which keeps
+    narrow features from hiding between two points. The interval with the
+    highest score is split at its midpoint until every score is below
+    tolerance_db. Intervals narrower than min_gap_hz, which is at least
+    2 Hz, are never split; a narrower interval has no whole frequency
+    strictly between its ends.
+
+    The tolerance should sit above the measurement noise, or noisy flat
+    regions are refined down to min_gap_hz.
+    """
+    def __init__(self, tolerance_db, max_gap_hz, min_gap_hz=2, frequencies=(), powers=()):
+        self.tolerance_db = tolerance_db
+        self.max_gap_hz = max_gap_hz
+        # Midpoints are rounded to whole Hz, so a 1 Hz interval would return one of its own ends.
+        self.min_gap_hz = max(min_gap_hz, 2)
+        self._freqs = []
+        self._powers = []
+        self._scores = {}
+        self._heap = []
+
+        # Repeated readings at one frequency are averaged.
+        frequencies = np.asarray(frequencies, dtype=float)
+        if len(frequencies):
+            unique_freqs, index = np.unique(frequencies, return_inverse=True)
+            mean_powers = np.bincount(index, weights=np.asarray(powers, dtype=float)) / np.bincount(index)
+            self._freqs = unique_freqs.tolist()
+            self._powers = mean_powers.tolist()
+            for i in range(len(self._freqs) - 1):
+                self._score_interval(i)
+
+    def __len__(self):
+        return len(self._freqs)
+
+    def __contains__(self, freq):
+        i = bisect.bisect_left(self._freqs, float(freq))
+        return i < len(self._freqs) and self._freqs[i] == float(freq)
+
+    def _deviation(self, i):
+        """Distance of point i from the line through its neighbours, in dB."""
+        if i <= 0 or i >= len(self._freqs) - 1:
+            return 0.0
+        x0, x1, x2 = self._freqs[i - 1], self._freqs[i], self._freqs[i + 1]
+        y0, y1, y2 = self._powers[i - 1], self._powers[i], self._powers[i + 1]
+        predicted = y0 + (y2 - y0) * (x1 - x0) / (x2 - x0)
+        return abs(y1 - predicted)
+
+    def _score_interval(self, i):
+        """Scores the interval from point i to point i + 1 and queues it."""
+        start, end = self._freqs[i], self._freqs[i + 1]
+        if end - start < self.min_gap_hz:
+            self._scores.pop((start, end), None)
+            return
+        error = max(self._deviation(i), self._deviation(i + 1))
+        score = error + self.tolerance_db * (end - start) / self.max_gap_hz
+        self._scores[(start, end)] = score
+        heapq.heappush(self._heap, (-score, start, end))
+
+    def add(self, freq, power):
+        """Adds a measured point, rescoring the intervals whose error it changes."""
+        freq = float(freq)
+        i = bisect.bisect_left(self._freqs, freq)
+        if i < len(self._freqs) and self._freqs[i] == freq:
+            self._powers[i] = (self._powers[i] + power) / 2
+        else:
+            if 0 < i < len(self._freqs):
+                self._scores.pop((self._freqs[i - 1], self._freqs[i]), None)
+            self._freqs.insert(i, freq)
+            self._powers.insert(i, float(power))
+        # Point i changed, so the deviations of points i - 1 .. i + 1 did too.
+        for j in range(max(i - 2, 0), min(i + 2, len(self._freqs) - 1)):
+            self._score_interval(j)
+
+    def max_score(self):
+        """Returns the highest interval score, or None when no interval can be split."""
+        while self._heap:
+            negative_score, start, end = self._heap[0]
+            if self._scores.get((start, end)) == -negative_score:
+                return -negative_score
+            heapq.heappop(self._heap)
+        return None
+
+    def next_frequency(self):
+        """Returns the next frequency to measure, or None once the tolerance is met."""
+        score = self.max_score()
+        if score is None or score < self.tolerance_db:
+            return None
+        _, start, end = self._heap[0]
+        return int(round(start + (end - start) / 2))
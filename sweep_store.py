@@ -0,0 +1,175 @@
+import time
+import numpy as np
+
+class SweepStore:
+    """
+    Growable column store for sweep results.
+
+    Each column is a preallocated NumPy array that doubles in size when full,
+    so appends are amortized O(1). Besides frequency, power and timestamp,
+    every point records the metadata current when it was added (RBW, SG
+    power, SA frequency offset), set with set_metadata().
+
+    column() and snapshot() return read-only views of the filled part of the
+    columns without copying. A view stays valid and unchanged after later
+    appends or clear(), because the store never writes to filled rows and
+    reallocates instead of reusing them.
+
+    Columns given to load_columns(), such as a memory-mapped session, are
+    kept as they are and new points go into separate arrays after them, so
+    a loaded session is never copied into memory. Only reads that span
+    both parts copy; pass start to read just the newer rows.
+    """
+    BASE_COLUMNS = ('frequency', 'power', 'timestamp')
+    METADATA_COLUMNS = ('rbw', 'sg_power', 'sa_freq_offset')
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.columns = self.BASE_COLUMNS + self.METADATA_COLUMNS
+        self._initial_capacity = capacity
+        # Incremented by clear(), so readers can tell a cleared store from one
+        # that has only grown.
+        self.generation = 0
+        self._base = {}
+        self._base_size = 0
+        self._allocate(capacity)
+        self.metadata = {name: np.nan for name in self.METADATA_COLUMNS}
+
+    def __len__(self):
+        return self._base_size + self._size
+
+    def _allocate(self, capacity):
+        self._data = {name: np.empty(capacity) for name in self.columns}
+        self._capacity = capacity
+        self._size = 0
+
+    def _reserve(self, size):
+        if size <= self._capacity:
+            return
+        capacity = max(size, 2 * self._capacity)
+        for name, column in self._data.items():
+            grown = np.empty(capacity)
+            grown[:self._size] = column[:self._size]
+            self._data[name] = grown
+        self._capacity = capacity
+
+    def set_metadata(self, **values):
+        """Sets metadata recorded with the points appended from now on, e.g. set_metadata(rbw=1000)."""
+        for name, value in values.items():
+            if name not in self.metadata:
+                raise KeyError(f"Unknown metadata column '{name}'.")
+            self.metadata[name] = np.nan if value is None else float(value)
+
+    def append(self, frequency, power, timestamp=None):
+        """Adds one point."""
+        self._reserve(self._size + 1)
+        i = self._size
+        self._data['frequency'][i] = frequency
+        self._data['power'][i] = power
+        self._data['timestamp'][i] = time.time() if timestamp is None else timestamp
+        for name, value in self.metadata.items():
+            self._data[name][i] = value
+        self._size += 1
+
+    def extend(self, frequencies, powers, timestamps=None, **metadata_columns):
+        """
+        Adds a block of points. Metadata columns not given take the current
+        metadata values.
+        """
+        frequencies = np.asarray(frequencies, dtype=float)
+        count = len(frequencies)
+        if count == 0:
+            return
+        start, stop = self._size, self._size + count
+        self._reserve(stop)
+        self._data['frequency'][start:stop] = frequencies
+        self._data['power'][start:stop] = powers
+        self._data['timestamp'][start:stop] = time.time() if timestamps is None else timestamps
+        for name, value in self.metadata.items():
+            self._data[name][start:stop] = metadata_columns.get(name, value)
+        self._size = stop
+
+    def load_columns(self, columns):
+        """
+        Replaces the contents with existing column arrays without copying them,
+        e.g. the memory-mapped columns of a saved session. Points appended
+        later are stored after them.
+        """
+        size = len(columns['frequency'])
+        self._base = {name: columns[name] if name in columns else np.full(size, np.nan) for name in self.columns}
+        self._base_size = size
+        self._allocate(self._initial_capacity)
+        self.generation += 1
+
+    def clear(self):
+        # Fresh arrays, so views handed out before the clear keep their data.
+        self._base = {}
+        self._base_size = 0
+        self._allocate(self._initial_capacity)
+        self.generation += 1
+
+    def column(self, name, start=0):
+        """
+        Returns a read-only view of one column from row start onwards. Only
+        copies when the rows span both loaded and appended points.
+        """
+        if start >= self._base_size:
+            view = self._data[name][start - self._base_size:self._size]
+        elif self._size == 0:
+            view = self._base[name][start:]
+        else:
+            view = np.concatenate((self._base[name][start:], self._data[name][:self._size]))
+        view.flags.writeable = False
+        return view
+
+    def snapshot(self, start=0):
+        """Returns a dict of read-only views of every column from row start onwards."""
+        return {name: self.column(name, start) for name in self.columns}
+
+    def to_dataframe(self):
+        """Copies the points into a pandas DataFrame."""
+        # pandas takes half a second to import, so only load it when needed.
+        import pandas as pd
+        return pd.DataFrame({name: np.array(self.column(name)) for name in self.columns})
+
+class ChunkBuffer:
+    """
+    Collects results into NumPy chunks for delivery to another thread.
+
+    add() returns a chunk when max_points results have accumulated, or when
+    max_interval_s has passed since the last chunk; the point that crosses a
+    threshold is included. Each result is timestamped when it is added, so
+    the time recorded is when it was measured rather than when it arrived. A slow sweep therefore still delivers every point
+    immediately, while a fast one delivers a few chunks per interval.
+    """
+    def __init__(self, max_points=256, max_interval_s=0.1):
+        self.max_points = max_points
+        self.max_interval_s = max_interval_s
+        self._freqs = np.empty(max_points)
+        self._powers = np.empty(max_points)
+        self._timestamps = np.empty(max_points)
+        self._size = 0
+        self._last_flush = time.monotonic() - max_interval_s
+
+    def __len__(self):
+        return self._size
+
+    def add(self, freq, power):
+        """Adds a result. Returns a (frequencies, powers, timestamps) chunk if one is due, otherwise None."""
+        self._freqs[self._size] = freq
+        self._powers[self._size] = power
+        self._timestamps[self._size] = time.time()
+        self._size += 1
+        if self._size >= self.max_points or time.monotonic() - self._last_flush >= self.max_interval_s:
+            return self.flush()
+        return None
+
+    def flush(self):
+        """Returns the pending results as a (frequencies, powers, timestamps) chunk, or None if there are none."""
+        self._last_flush = time.monotonic()
+        if self._size == 0:
+            return None
+        chunk = (self._freqs[:self._size].copy(), self._powers[:self._size].copy(),
+                 self._timestamps[:self._size].copy())
+        self._size = 0
+        return chunk
@@ -1,5 +1,11 @@
+import json
+import logging
 import numpy as np
+import os
 import time
+from devices.instrument_actor import submit
+
+logger = logging.getLogger(__name__)
 
 def parse_frequency(freq_str: str) -> float:
     """Parses a frequency string with units (e.g., '100mhz', '2.4ghz') into Hz."""
@@ -19,6 +25,15 @@ def parse_frequency(freq_str: str) -> float:
     
     return float(freq_str) * multiplier
 
+def write_json_atomic(filepath, data):
+    """Writes JSON through a temporary file, so a crash never leaves a partial file behind."""
+    temp_path = filepath + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, filepath)
+
 def halton(index, base):
     """Generator for Halton sequence."""
     result = 0
@@ -30,7 +45,71 @@ def halton(index, base):
         i = int(i / base)
     return result
 
-def run_sweep(sa, sg, frequencies, sg_tracking_disabled=False, sa_freq_offset=0, log_callback=None):
+def measure_point(sa, sg, freq, sg_tracking_disabled=False, sa_freq_offset=0, power_mode='marker', log_callback=None,
+                  settle_tolerance_db=None, max_settle_reads=5, sweep_timeout_s=None):
+    """
+    Tunes the instruments to a single frequency and measures the power there.
+
+    Args:
+        sa: Spectrum analyzer instance.
+        sg: Signal generator instance.
+        freq: Frequency to measure, in Hz.
+        sg_tracking_disabled (bool): If True, the SG frequency is not changed.
+        sa_freq_offset (int): Frequency offset for the spectrum analyzer.
+        power_mode (str): 'marker' or 'trace_mean', see SpectrumAnalyzer.measure_power.
+        log_callback: A function to call for warnings. Per-point progress is
+                      logged to this module's logger at DEBUG level.
+        settle_tolerance_db (float): If set, keep re-sweeping until two consecutive
+                                     readings agree within this tolerance.
+        max_settle_reads (int): Maximum number of readings in that case.
+        sweep_timeout_s (float): Timeout for each sweep. Queried from the SA if not given.
+
+    Returns:
+        The measured power in dBm.
+    """
+    if log_callback is None:
+        log_callback = print
+
+    sa_freq = freq + sa_freq_offset
+    if sg_tracking_disabled:
+        logger.debug("Measuring SA (with offset) at %sHz...", sa_freq)
+        # Retune and start the sweep in a single bus message, then wait for the
+        # end-of-sweep service request.
+        with sa.batch():
+            sa.set_center_frequency(sa_freq)
+            sa.take_sweep_and_wait(sweep_timeout_s)
+    else:
+        logger.debug("Setting SG freq: %s", freq)
+        # When the instruments run on actor threads the SA retunes while the
+        # SG settles; plain drivers run these one after the other.
+        sg_ready = submit(sg, lambda driver: driver.set_frequency_and_settle(freq + sa_freq_offset))
+        sa_ready = submit(sa, lambda driver: driver.set_center_frequency(sa_freq))
+        settle_time = sg_ready.result()
+        sa_ready.result()
+        logger.debug("  SG settle: %.0f ms", settle_time * 1e3)
+        logger.debug("Measuring SA (with offset) at %sHz...", sa_freq)
+        sa.take_sweep_and_wait(sweep_timeout_s)
+
+    power = sa.measure_power(power_mode)
+    if settle_tolerance_db is not None:
+        power = _read_until_stable(sa, power, power_mode, settle_tolerance_db, max_settle_reads, log_callback,
+                                   sweep_timeout_s)
+    logger.debug("  Power: %.2f dBm", power)
+    return power
+
+def _read_until_stable(sa, power, power_mode, tolerance_db, max_reads, log_callback, sweep_timeout_s=None):
+    """Re-sweeps until two consecutive readings agree within tolerance_db."""
+    for _ in range(max_reads - 1):
+        previous = power
+        sa.take_sweep_and_wait(sweep_timeout_s)
+        power = sa.measure_power(power_mode)
+        if abs(power - previous) <= tolerance_db:
+            return power
+    log_callback(f"  Warning: reading did not settle within {tolerance_db} dB after {max_reads} reads.")
+    return power
+
+def run_sweep(sa, sg, frequencies, sg_tracking_disabled=False, sa_freq_offset=0, log_callback=None, power_mode='marker',
+              settle_tolerance_db=None):
     """
     Runs a frequency sweep and yields the results.
 
@@ -40,29 +119,78 @@ def run_sweep(sa, sg, frequencies, sg_tracking_disabled=False, sa_freq_offset=0,
         frequencies: A list or array of frequencies to sweep.
         sg_tracking_disabled (bool): If True, the SG frequency is not changed.
         sa_freq_offset (int): Frequency offset for the spectrum analyzer.
-        log_callback: A function to call for logging messages.
+        log_callback: A function to call for logging messages. Per-point
+                      progress is logged to this module's logger at DEBUG level.
+        power_mode (str): 'marker' or 'trace_mean', see SpectrumAnalyzer.measure_power.
+        settle_tolerance_db (float): Optional convergence tolerance, see measure_point.
     """
     if log_callback is None:
         log_callback = print
 
     start_time = time.time()
+    sweep_timeout_s = sa.get_sweep_timeout()
     for freq in frequencies:
-        if not sg_tracking_disabled:
-            log_callback(f"Setting SG freq: {freq}")
-            sg.set_frequency(freq + sa_freq_offset)
-            time.sleep(0.1)  # Small delay to allow SG to settle
-        
-        sa_freq = freq + sa_freq_offset
-        log_callback(f"Measuring SA (with offset) at {sa_freq}Hz...")
-        sa.set_center_frequency(sa_freq)
-
-        sa.take_sweep()
-        sa.wait_done()
-
-        power = sa.get_marker_power()
-        log_callback(f"  Power: {power:.2f} dBm")
-        
+        power = measure_point(sa, sg, freq, sg_tracking_disabled, sa_freq_offset, power_mode, log_callback,
+                              settle_tolerance_db=settle_tolerance_db, sweep_timeout_s=sweep_timeout_s)
         yield freq, power
     
     stop_time = time.time()
     log_callback(f"Done running sweep. Sweep took {int(stop_time-start_time)} seconds.")
+
+def interpolate_peak(frequencies, powers):
+    """
+    Finds the peak of a trace with sub-bin resolution by fitting a parabola
+    through the highest point and its two neighbours.
+
+    Returns:
+        A (frequency_hz, power_dbm) tuple for the interpolated peak.
+    """
+    i = int(np.argmax(powers))
+    if i == 0 or i == len(powers) - 1:
+        return float(frequencies[i]), float(powers[i])
+
+    y0, y1, y2 = powers[i - 1], powers[i], powers[i + 1]
+    denominator = y0 - 2 * y1 + y2
+    delta = 0.5 * (y0 - y2) / denominator if denominator != 0 else 0.0
+    bin_width = frequencies[i + 1] - frequencies[i]
+    return float(frequencies[i] + delta * bin_width), float(y1 - 0.25 * (y0 - y2) * delta)
+
+def find_frequency_offset(sa, sg, freq_hz, span_hz=20e3, rbw_hz=None, log_callback=None):
+    """
+    Measures the SA/SG frequency offset with a single sweep. The SG is parked
+    at freq_hz and the SA sweeps a narrow span around it; the offset is the
+    distance of the interpolated peak from freq_hz.
+
+    The SG must already have its power set and RF enabled, and freq_hz should
+    be a multiple of the SG's frequency step.
+
+    Args:
+        sa: Spectrum analyzer instance.
+        sg: Signal generator instance.
+        freq_hz: Frequency to park the SG at.
+        span_hz: SA span, wide enough to contain the expected offset.
+        rbw_hz: SA resolution bandwidth. Defaults to 1/100 of the span.
+        log_callback: A function to call for logging messages.
+
+    Returns:
+        The offset in Hz, suitable for the sa_freq_offset sweep parameter.
+    """
+    if log_callback is None:
+        log_callback = print
+    if rbw_hz is None:
+        rbw_hz = span_hz / 100
+
+    log_callback(f"Parking SG at {freq_hz} Hz for offset calibration...")
+    sg.set_frequency_and_settle(freq_hz)
+    with sa.batch():
+        sa.set_single_sweep_mode()
+        sa.set_center_frequency(freq_hz)
+        sa.set_span(span_hz)
+        sa.set_resolution_bandwidth(rbw_hz)
+    sa.take_sweep_and_wait()
+
+    frequencies, powers = sa.get_trace(1, freq_hz - span_hz / 2, freq_hz + span_hz / 2)
+    peak_freq, peak_power = interpolate_peak(frequencies, powers)
+    offset = int(round(peak_freq - freq_hz))
+    log_callback(f"Peak found at {peak_freq:.1f} Hz ({peak_power:.2f} dBm). Offset: {offset} Hz")
+    return offset
@@ -1,13 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
 import pyvisa
+from instrument_cache import InstrumentCache
 
-def discover_and_connect(device_class_map):
+# Time an instrument gets to answer ID? during discovery. Present instruments
+# answer in milliseconds; absent addresses cost the full timeout.
+IDENTIFY_TIMEOUT_MS = 1000
+# Upper bound on the number of resources probed at the same time.
+MAX_PROBE_WORKERS = 16
+
+def list_gpib_resources(rm):
+    return [r for r in rm.list_resources() if r.startswith("GPIB")]
+
+def identify_resource(rm, resource_str, timeout_ms=IDENTIFY_TIMEOUT_MS):
+    """Opens a resource, queries ID? with a short timeout and closes it. Returns the identity, or None if it does not answer."""
+    resource = None
+    try:
+        resource = rm.open_resource(resource_str)
+        resource.timeout = timeout_ms
+        return resource.query("ID?").strip()
+    except Exception:
+        # Some backends raise other errors (e.g. a failed open) for absent
+        # or misbehaving devices; none of them should stop discovery.
+        return None
+    finally:
+        if resource is not None:
+            try:
+                resource.close()
+            except Exception:
+                pass
+
+def discover_instruments(rm=None, resources=None, timeout_ms=IDENTIFY_TIMEOUT_MS):
+    """
+    Identifies the instruments on the GPIB bus.
+
+    Every resource is probed at once, so discovery takes about one
+    timeout_ms however many addresses are silent.
+
+    Args:
+        rm: The pyvisa ResourceManager to use. A new one is created if None.
+        resources: The resource strings to probe. Defaults to every GPIB resource.
+        timeout_ms: How long each resource gets to answer ID?.
+
+    Returns:
+        A dictionary mapping the address of each instrument that answered
+        to its identity string (e.g. 'HP8593EM'), in address order.
+    """
+    if rm is None:
+        rm = pyvisa.ResourceManager()
+    if resources is None:
+        resources = list_gpib_resources(rm)
+    if not resources:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(MAX_PROBE_WORKERS, len(resources))) as executor:
+        identities = list(executor.map(lambda r: identify_resource(rm, r, timeout_ms), resources))
+    return {address: identity for address, identity in zip(resources, identities) if identity}
+
+def _match_devices(identities, device_ids, addresses):
+    """Adds the address of each device ID not yet in addresses whose identity matches, first address first."""
+    for address, identity in identities.items():
+        for device_id in device_ids:
+            if device_id in identity and device_id not in addresses and address not in addresses.values():
+                addresses[device_id] = address
+                break
+
+def discover_and_connect(device_class_map, rm=None, timeout_ms=IDENTIFY_TIMEOUT_MS, cache=None, use_cache=True):
     """
     Discovers, connects to, and initializes specified GPIB devices.
 
+    Devices remembered in the instrument cache are verified with one ID?
+    query each; the whole bus is only probed for devices that are not
+    cached or no longer answer at their cached address.
+
     Args:
         device_class_map: A dictionary where keys are device ID strings
                           (e.g., '8593EM') and values are the corresponding
                           wrapper classes (e.g., HP8593EM).
+        rm: The pyvisa ResourceManager to use. A new one is created if None.
+        timeout_ms: How long each resource gets to answer ID? during discovery.
+        cache: The InstrumentCache to use. The default cache file is used if None.
+        use_cache: Set to False to always probe the whole bus.
 
     Returns:
         A dictionary of initialized device objects, keyed by their device ID string.
@@ -15,53 +87,60 @@ def discover_and_connect(device_class_map):
     Raises:
         ConnectionError: If not all specified devices are found.
     """
-    rm = pyvisa.ResourceManager()
-    resources = [r for r in rm.list_resources() if r.startswith("GPIB")]
-    print(f"Searching for {list(device_class_map.keys())} in GPIB resources: {resources}")
-
-    found_devices = {}
-    opened_resources = []
-
-    device_ids_to_find = list(device_class_map.keys())
+    if rm is None:
+        rm = pyvisa.ResourceManager()
+    if use_cache and cache is None:
+        cache = InstrumentCache()
 
-    try:
-        for resource_str in resources:
-            if len(found_devices) == len(device_ids_to_find):
-                break
+    addresses = {}
+    # Identities verified during this call, keyed by address.
+    verified = {}
+    if use_cache:
+        cached = {device_id: cache.find(device_id) for device_id in device_class_map}
+        cached = {device_id: address for device_id, address in cached.items() if address}
+        identities = discover_instruments(rm, sorted(set(cached.values())), timeout_ms)
+        verified.update(identities)
+        for address in set(cached.values()):
+            if address in identities:
+                cache.record(address, identities[address])
+            else:
+                cache.forget(address)
+        _match_devices({address: identities[address] for device_id, address in cached.items()
+                        if device_id in identities.get(address, "")}, list(cached), addresses)
+        for device_id, address in addresses.items():
+            print(f"Found {device_id} at {address} (cached)")
 
-            try:
-                resource = rm.open_resource(resource_str)
-                opened_resources.append(resource)
-                identity = resource.query("ID?").strip()
-
-                for device_id, device_class in device_class_map.items():
-                    if device_id in identity and device_id not in found_devices:
-                        print(f"Found {device_id} at {resource_str}")
-                        # Initialize the class with the resource
-                        found_devices[device_id] = device_class(resource)
-                        break 
-            except pyvisa.errors.VisaIOError:
-                continue # Ignore devices that can't be queried
+    missing = [device_id for device_id in device_class_map if device_id not in addresses]
+    if missing:
+        print(f"Searching for {missing} on the GPIB bus...")
+        instruments = discover_instruments(rm, timeout_ms=timeout_ms)
+        verified.update(instruments)
+        _match_devices(instruments, missing, addresses)
+        for device_id in missing:
+            if device_id in addresses:
+                print(f"Found {device_id} at {addresses[device_id]}")
+        if use_cache:
+            cache.replace(instruments)
 
-        # Verify all devices were found
-        for device_id in device_ids_to_find:
-            if device_id not in found_devices:
-                raise ConnectionError(f"Could not find device '{device_id}'.")
+    if use_cache:
+        for device_id, address in addresses.items():
+            cache.record(address, verified[address], device_class_map[device_id].__name__)
+        cache.save()
 
-        # Close unused resources that were successfully opened
-        all_instantiated_resources = [dev.resource for dev in found_devices.values()]
-        for res in opened_resources:
-            if res not in all_instantiated_resources:
-                res.close()
+    for device_id in device_class_map:
+        if device_id not in addresses:
+            raise ConnectionError(f"Could not find device '{device_id}'.")
 
+    found_devices = {}
+    try:
+        for device_id, address in addresses.items():
+            found_devices[device_id] = device_class_map[device_id](rm.open_resource(address))
         return found_devices
-
     except Exception:
-        # Ensure all opened resources are closed on failure
-        for res in opened_resources:
+        # Ensure all opened devices are closed on failure
+        for device in found_devices.values():
             try:
-                # This might fail if the resource is already gone, but it's worth trying
-                res.close()
+                device.close()
             except pyvisa.errors.VisaIOError:
-                pass 
+                pass
         raise